@@ -0,0 +1,54 @@
+import os
+
+
+# Database profiles. The development profile is the single connection the
+# project always had; production tunes SQLite for concurrent workers.
+
+SQLITE_PRAGMAS = [
+    # Readers no longer block the writer and vice versa.
+    'PRAGMA journal_mode = WAL',
+    # Safe with WAL: a power loss can only drop the last commits.
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -20000',
+    'PRAGMA mmap_size = 134217728',
+]
+
+
+def sqlite_databases(name, profile='development'):
+    if profile != 'production':
+        return {
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': name,
+            }
+        }
+
+    primary = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            # Take the write lock at BEGIN; a deferred transaction that
+            # reads first cannot wait for it and fails with "locked".
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+        },
+    }
+    replica = dict(primary, OPTIONS={
+        'timeout': 20,
+        'init_command': '; '.join(SQLITE_PRAGMAS + ['PRAGMA query_only = ON']),
+    }, TEST={'MIRROR': 'default'})
+    # Throttle counters are written on every throttled request, reads
+    # included. A file of their own keeps that off the catalog's write
+    # lock; run `migrate --database throttle` to create its table.
+    throttle = dict(primary, NAME=throttle_path(name))
+    return {'default': primary, 'replica': replica, 'throttle': throttle}
+
+
+def throttle_path(name):
+    root, extension = os.path.splitext(str(name))
+    return root + '-throttle' + (extension or '.sqlite3')
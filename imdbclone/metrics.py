@@ -0,0 +1,313 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.serializers import BaseSerializer
+
+from moviesinfo.api.cache import stats as response_cache_stats
+from moviesinfo.models import Task
+from moviesinfo.queue import queue_stats
+from userapp.api.authentication import token_cache
+
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'total', SECONDS_BUCKETS,
+     'Time spent handling the request, until the response is rendered.'),
+    ('http_request_db_seconds', 'db', SECONDS_BUCKETS,
+     'Time spent executing SQL.'),
+    ('http_request_app_seconds', 'app', SECONDS_BUCKETS,
+     'View time outside SQL and serialization: auth, throttling and '
+     'view logic.'),
+    ('http_request_serialize_seconds', 'serialize', SECONDS_BUCKETS,
+     'Time spent turning rows into response data, outside SQL.'),
+    ('http_request_render_seconds', 'render', SECONDS_BUCKETS,
+     'Time spent rendering the response body.'),
+    ('http_request_queries', 'queries', QUERY_BUCKETS,
+     'SQL queries executed per request.'),
+)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Per-route histograms of the timings recorded by MetricsMiddleware.
+    Values are per process; Prometheus aggregates across workers.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._queue = None
+        self._lock = threading.Lock()
+
+    def observe(self, route, timings):
+        with self._lock:
+            for name, field, buckets, _ in HISTOGRAMS:
+                key = (name, route)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(buckets)
+                self._histograms[key].observe(getattr(timings, field))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._queue = None
+
+    def queue_stats(self):
+        # Counting the Task table on every scrape would put a query on the
+        # primary per scrape per worker; the counts are reused for
+        # METRICS_QUEUE_STATS_TTL seconds.
+        now = time.monotonic()
+        with self._lock:
+            if self._queue is not None and self._queue[0] > now:
+                return self._queue[1]
+        stats = queue_stats()
+        with self._lock:
+            self._queue = (
+                now + getattr(settings, 'METRICS_QUEUE_STATS_TTL', 15), stats)
+        return stats
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, _, _, description in HISTOGRAMS:
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s histogram' % name)
+                for (metric, route), histogram in sorted(
+                        self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets,
+                                            histogram.counts):
+                        cumulative += count
+                        lines.append('%s_bucket{route="%s",le="%s"} %d' % (
+                            name, route, bound, cumulative))
+                    lines.append('%s_bucket{route="%s",le="+Inf"} %d' % (
+                        name, route, histogram.count))
+                    lines.append('%s_sum{route="%s"} %.6f' % (
+                        name, route, histogram.sum))
+                    lines.append('%s_count{route="%s"} %d' % (
+                        name, route, histogram.count))
+
+        for prefix, values in (
+                ('response_cache', response_cache_stats.snapshot()),
+                ('token_cache', token_cache.stats())):
+            for key, value in values.items():
+                kind = 'gauge' if key in ('size', 'hit_ratio') else 'counter'
+                suffix = '' if kind == 'gauge' else '_total'
+                lines.append('# TYPE %s_%s%s %s' % (prefix, key, suffix,
+                                                    kind))
+                lines.append('%s_%s%s %s' % (prefix, key, suffix, value))
+
+        queue = self.queue_stats()
+        lines.append('# TYPE task_queue_tasks gauge')
+        for status in (Task.PENDING, Task.RUNNING, Task.FAILED):
+            lines.append('task_queue_tasks{status="%s"} %d' % (
+                status, queue[status]))
+        lines.append('# TYPE task_queue_oldest_due_seconds gauge')
+        lines.append('task_queue_oldest_due_seconds %.3f' %
+                     queue['oldest_due_seconds'])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.view_start = None
+        self.view_end = None
+        self.render_end = None
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    @property
+    def total(self):
+        return (self.render_end or time.perf_counter()) - self.start
+
+    @property
+    def app(self):
+        if self.view_start is None:
+            return 0.0
+        view_end = self.view_end or self.render_end or time.perf_counter()
+        return max(view_end - self.view_start - self.db - self.serialize,
+                   0.0)
+
+    @property
+    def render(self):
+        if self.view_end is None or self.render_end is None:
+            return 0.0
+        return self.render_end - self.view_end
+
+    def server_timing(self):
+        return ', '.join([
+            'db;dur=%.3f;desc="%d queries"' % (self.db * 1000, self.queries),
+            'app;dur=%.3f' % (self.app * 1000),
+            'serialize;dur=%.3f' % (self.serialize * 1000),
+            'render;dur=%.3f' % (self.render * 1000),
+            'total;dur=%.3f' % (self.total * 1000),
+        ])
+
+
+# The timings of the request being handled, for phases the middleware
+# cannot see from outside the view.
+current_timings = ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Count the enclosed block as serialization time of the current request.
+    Queries it runs stay in the db phase.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start, db = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.serialize += time.perf_counter() - start - (timings.db - db)
+
+
+def instrument_serializers():
+    # DRF has no hook around serialization, but every serializer.data,
+    # single or many, goes through BaseSerializer.data.
+    data = BaseSerializer.data.fget
+    if getattr(data, 'timed', False):
+        return
+
+    def timed_data(serializer):
+        with timed_serialization():
+            return data(serializer)
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
+
+
+class MetricsMiddleware:
+    """
+    Time SQL, view and render phases of every request, report them in a
+    Server-Timing header and feed the per-route histograms. Runs natively
+    in both modes, so under ASGI it never pushes async views through the
+    sync adapter.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_serializers()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # The async handler runs sync hooks on the shared sync thread;
+            # coroutine versions keep them on the event loop.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = request._timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with self.timed_queries(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = request._timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with self.timed_queries(timings):
+                response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def timed_queries(self, timings):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(timings.record_query))
+        return stack
+
+    def finish(self, request, response, timings):
+        if timings.render_end is None:
+            timings.render_end = time.perf_counter()
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else 'unmatched'
+        if route != 'metrics':
+            registry.observe(route, timings)
+        response['Server-Timing'] = timings.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    def process_template_response(self, request, response):
+        return self.view_finished(request, response)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    async def aprocess_template_response(self, request, response):
+        return self.view_finished(request, response)
+
+    def view_started(self, request):
+        request._timings.view_start = time.perf_counter()
+
+    def view_finished(self, request, response):
+        # DRF responses are rendered after the view returns; the callback
+        # marks the end of rendering.
+        timings = request._timings
+        timings.view_end = time.perf_counter()
+
+        def rendered(response):
+            timings.render_end = time.perf_counter()
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics(request):
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,52 @@
+from django.db import connections
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to the read-only 'replica' connection and writes to
+    'default'. Both open the same SQLite file, so a committed write is
+    visible to the next read; inside an open transaction reads stay on the
+    primary so they see its uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return 'replica'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ThrottleRouter:
+    """
+    Keep the throttle counters in the 'throttle' database, so counting a
+    read never takes the catalog's write lock. Listed before
+    PrimaryReplicaRouter, which would send their reads to the replica.
+    """
+
+    models = {'moviesinfo.throttlecounter'}
+
+    def route(self, model):
+        if model._meta.label_lower in self.models:
+            return 'throttle'
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.route(model)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name and '%s.%s' % (app_label, model_name) in self.models:
+            return db == 'throttle'
+        if db == 'throttle':
+            return False
+        return None
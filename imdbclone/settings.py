@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from imdbclone.database import sqlite_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +35,7 @@ ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
     'moviesinfo',
+    'userapp',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -44,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'imdbclone.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,13 +82,37 @@ WSGI_APPLICATION = 'imdbclone.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# IMDBCLONE_DB_PROFILE=production enables WAL, tuned pragmas, persistent
+# connections, a read-only replica connection for reads and a separate
+# file for throttle counters (`migrate --database throttle`).
+
+DATABASE_PROFILE = os.environ.get('IMDBCLONE_DB_PROFILE', 'development')
+
+DATABASES = sqlite_databases(BASE_DIR / 'db.sqlite3', DATABASE_PROFILE)
+
+if 'replica' in DATABASES:
+    DATABASE_ROUTERS = ['imdbclone.routers.ThrottleRouter',
+                        'imdbclone.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; switch to FileBasedCache to share cached
+# responses between workers.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    #     'LOCATION': BASE_DIR / 'cache',
+    # }
 }
 
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,7 +164,8 @@ REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # 'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        # 'rest_framework.authentication.TokenAuthentication',
+        'userapp.api.authentication.CachedTokenAuthentication',
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
 
@@ -150,6 +180,7 @@ REST_FRAMEWORK = {
         'review-create': '2/day',
         'review-list': '100/day',
         'review-detail': '100/day',
+        'review-batch': '1000/day',
     },
 
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -160,6 +191,58 @@ REST_FRAMEWORK = {
     ),
 }
 
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+
+# Registration hashes passwords on a bounded pool (userapp.api.hashing);
+# callers that wait longer than the timeout for a slot get a 429.
+PASSWORD_HASHING_WORKERS = max((os.cpu_count() or 2) // 2, 1)
+PASSWORD_HASHING_QUEUE = 32
+PASSWORD_HASHING_TIMEOUT = 5
+
+# Rankings (moviesinfo.rankings). A prior weight of None uses the average
+# number of reviews per movie. Reviews are read RANKING_BATCH_SIZE rows at
+# a time.
+RANKING_HALF_LIFE_DAYS = 7
+RANKING_PRIOR_WEIGHT = None
+RANKING_WINDOW_HALF_LIVES = 20
+RANKING_BATCH_SIZE = 10000
+
+# Similar movies (moviesinfo.similarity). The block size bounds how many
+# movies' similarity rows are held in memory at once.
+SIMILARITY_NEIGHBORS = 20
+SIMILARITY_BLOCK_SIZE = 1024
+SIMILARITY_BATCH_SIZE = 1000
+
+# Platform and movie deletes (moviesinfo.purge) remove dependent rows this
+# many at a time, each batch in its own transaction, sleeping PURGE_PAUSE
+# seconds between batches so other writers get the database.
+PURGE_BATCH_SIZE = 1000
+PURGE_PAUSE = 0
+
+# Background tasks (moviesinfo.queue), run by `manage.py run_tasks`. Eager
+# mode runs every task inline at enqueue time instead, e.g. without a worker.
+TASK_QUEUE_EAGER = False
+TASK_QUEUE_LEASE = 300
+TASK_QUEUE_RETRY_DELAY = 10
+TASK_QUEUE_POLL_INTERVAL = 1.0
+
+# Seconds a review write waits before the shared follow-up work runs, so a
+# burst of writes is coalesced into one refresh.
+RANKING_REFRESH_DELAY = 60
+SIMILARITY_REFRESH_DELAY = 3600
+CACHE_WARM_DELAY = 90
+CACHE_WARM_URLS = ['movie-list', 'watch-list', 'platform-list',
+                   'platform-leaderboard', 'movie-top-rated',
+                   'movie-trending']
+# Warmed entries only serve visitors on this host and scheme. None uses the
+# first exact name in ALLOWED_HOSTS.
+CACHE_WARM_HOST = None
+CACHE_WARM_SECURE = False
+
+# Seconds the /metrics/ endpoint reuses its task queue counts.
+METRICS_QUEUE_STATS_TTL = 15
+
 # SIMPLE_JWT = {
 #     'ROTATE_REFRESH_TOKENS' : True,
 # }
\ No newline at end of file
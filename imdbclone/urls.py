@@ -17,10 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from imdbclone.metrics import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('home/', include('moviesinfo.api.urls')),
-    path('user/', include('userapp.api.urls'))
+    path('user/', include('userapp.api.urls')),
+    path('metrics/', metrics, name='metrics'),
     
     # path('api-auth/', include('rest_framework.urls')),
 ]
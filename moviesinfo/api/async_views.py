@@ -0,0 +1,120 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from moviesinfo.models import Movies, Platform, Review
+from moviesinfo.api.serializers import MovieDetailSerializer, \
+                        MovieSerializer, PlatformSerializer
+from moviesinfo.api.cache import cache_response, conditional_response, \
+                        conditional_rows
+from moviesinfo.api.compiled import compile_serializer
+from moviesinfo.api.export import aexport_response
+from moviesinfo.api.views import MoviesAV, MoviesDetailAV, ReviewList, \
+                        movie_queryset, movie_rows, platform_queryset, \
+                        platform_rows
+
+
+class AsyncDispatchMixin:
+    """
+    Awaits coroutine handlers directly instead of running the whole view
+    behind a sync adapter. Authentication, permissions and throttles still
+    run as the sync view would, so behaviour matches the sync endpoints.
+    """
+    http_method_names = ['get', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(),
+                                  self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
+
+
+class MoviesAsyncAV(AsyncDispatchMixin, MoviesAV):
+
+    @cache_response(Movies, Platform, Review)
+    async def get(self, request):
+        movies = movie_queryset()
+        export = request.query_params.get('export')
+        if export:
+            return aexport_response(movies, MovieSerializer, export)
+
+        compiled = compile_serializer(MovieSerializer)
+        to_representation = compiled.bind()
+        return Response([to_representation(row)
+                         async for row in compiled.values(movies)])
+
+
+class MoviesDetailAsyncAV(AsyncDispatchMixin, MoviesDetailAV):
+
+    @conditional_rows(movie_rows)
+    async def get(self, request, pk):
+        try:
+            movie = await movie_queryset().aget(pk=pk)
+        except Movies.DoesNotExist:
+            return Response({'error': 'Not found'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        serializer = MovieDetailSerializer(movie)
+        return Response(serializer.data)
+
+
+class PlatformAsyncAV(AsyncDispatchMixin, APIView):
+
+    @cache_response(Platform, Movies, Review)
+    async def get(self, request):
+        queryset = platform_queryset()
+        export = request.query_params.get('export')
+        if export:
+            return aexport_response(queryset, PlatformSerializer, export,
+                                    chunk_size=100)
+
+        serializer = PlatformSerializer(
+            [platform async for platform in queryset], many=True)
+        return Response(serializer.data)
+
+
+class PlatformDetailAsyncAV(AsyncDispatchMixin, APIView):
+
+    @conditional_rows(platform_rows)
+    @cache_response(Platform, Movies, Review)
+    async def get(self, request, pk):
+        platform = await aget_object_or_404(platform_queryset(), pk=pk)
+        serializer = PlatformSerializer(platform)
+        return Response(serializer.data)
+
+
+class ReviewListAsync(AsyncDispatchMixin, ReviewList):
+
+    @conditional_response(Review)
+    @cache_response(Review)
+    async def get(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class())
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = await sync_to_async(self.paginate_queryset)(queryset)
+        return self.get_paginated_response(compiled.serialize(page))
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+
+class CacheStats:
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def is_shared():
+    # Whether another process can read what this one stores.
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def version_key(model):
+    return 'catalog:version:%s' % model._meta.label_lower
+
+
+def modified_key(model):
+    return 'catalog:modified:%s' % model._meta.label_lower
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so a flushed cache can never hand out a
+            # version that an older entry was stored under.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _incr_version(model):
+    cache = get_cache()
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+    cache.set(modified_key(model), time.time(), None)
+
+
+def bump_version(model):
+    # Bump now so this process stops serving pre-write entries, and again
+    # on commit so a reader racing the open transaction cannot pin stale
+    # data under the new version.
+    _incr_version(model)
+    transaction.on_commit(lambda: _incr_version(model))
+
+
+def response_key(request, models):
+    # Pagination links are absolute, so the host and scheme are part of
+    # the response.
+    authenticator = request.successful_authenticator
+    params = sorted(request.query_params.lists())
+    digest = hashlib.sha1(repr((
+        request.scheme,
+        request.get_host(),
+        request.path,
+        params,
+        type(authenticator).__name__ if authenticator else 'anon',
+    )).encode()).hexdigest()
+    versions = '.'.join(str(version) for version in get_versions(models))
+    return 'catalog:response:%s:%s' % (versions, digest)
+
+
+def lookup(request, models):
+    key = response_key(request, models)
+    data = get_cache().get(key)
+    stats.record(hit=data is not None)
+    return key, data
+
+
+def store(key, response):
+    if isinstance(response, Response) and response.status_code == 200:
+        get_cache().set(key, response.data,
+                        getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_response(*models):
+    """
+    Cache the ``response.data`` of a read handler until one of ``models``
+    changes. Works on both sync and async handlers.
+    """
+    def decorator(handler):
+        if asyncio.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(view, request, *args, **kwargs):
+                key, data = await sync_to_async(lookup)(request, models)
+                if data is not None:
+                    return Response(data, headers={'X-Cache': 'HIT'})
+                response = await handler(view, request, *args, **kwargs)
+                return await sync_to_async(store)(key, response)
+            return async_wrapper
+
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key, data = lookup(request, models)
+            if data is not None:
+                return Response(data, headers={'X-Cache': 'HIT'})
+            response = handler(view, request, *args, **kwargs)
+            return store(key, response)
+        return wrapper
+    return decorator
+
+
+def validators(request, models):
+    # Versions are only as fresh as the cache they live in; with a
+    # per-process cache another worker's write goes unseen. Rolling the
+    # validators over every RESPONSE_CACHE_TIMEOUT bounds a stale 304 the
+    # same way the timeout bounds a stale cached response.
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    window = int(time.time() // timeout) * timeout
+    key = response_key(request, models)
+    etag = '"%s"' % hashlib.sha1(
+        ('%s:%d' % (key, window)).encode()).hexdigest()
+
+    modified = get_cache().get_many([modified_key(model) for model in models])
+    last_modified = int(max([window] + list(modified.values())))
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    response = get_conditional_response(
+        request._request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def add_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional_response(*models):
+    """
+    Answer If-None-Match / If-Modified-Since from the version counters of
+    ``models`` with a 304, before any query or serialization runs.
+    """
+    def decorator(handler):
+        if asyncio.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(view, request, *args, **kwargs):
+                etag, last_modified = await sync_to_async(validators)(
+                    request, models)
+                response = not_modified(request, etag, last_modified)
+                if response is not None:
+                    return response
+                response = await handler(view, request, *args, **kwargs)
+                return add_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            etag, last_modified = validators(request, models)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            response = handler(view, request, *args, **kwargs)
+            return add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def row_etag(rows):
+    rows = list(rows)
+    if not rows:
+        return None
+    return '"%s"' % hashlib.sha1(repr(rows).encode()).hexdigest()
+
+
+def row_not_modified(request, etag):
+    response = None
+    if etag is not None:
+        response = get_conditional_response(request._request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def add_row_etag(response, etag):
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
+
+def conditional_rows(rows):
+    """
+    Answer If-None-Match with a 304 from an ETag over the values a detail
+    response is rendered from, ``rows(*args, **kwargs)``: one indexed query
+    and no serialization. Unlike the version counters, the rows are the
+    same for every worker and only change with the object itself.
+    """
+    def decorator(handler):
+        if asyncio.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(view, request, *args, **kwargs):
+                etag = await sync_to_async(row_etag)(rows(*args, **kwargs))
+                response = row_not_modified(request, etag)
+                if response is not None:
+                    return response
+                response = await handler(view, request, *args, **kwargs)
+                return add_row_etag(response, etag)
+            return async_wrapper
+
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            etag = row_etag(rows(*args, **kwargs))
+            response = row_not_modified(request, etag)
+            if response is not None:
+                return response
+            response = handler(view, request, *args, **kwargs)
+            return add_row_etag(response, etag)
+        return wrapper
+    return decorator
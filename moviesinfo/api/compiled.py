@@ -0,0 +1,150 @@
+from functools import lru_cache
+
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from imdbclone.metrics import timed_serialization
+
+
+# DRF fields whose to_representation returns the database value unchanged
+# when they sit on the matching model field.
+PASSTHROUGH = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField,)),
+    (serializers.BooleanField, (models.BooleanField,)),
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def iso_datetime(field):
+    # DateTimeField.to_representation looks up the active timezone for
+    # every value; resolve it once per response instead.
+    field_timezone = field.timezone if hasattr(field, 'timezone') \
+        else field.default_timezone()
+
+    def transform(value):
+        if field_timezone is None or value.utcoffset() is None:
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return transform
+
+
+class CompiledSerializer:
+    """
+    Read-only fast path for a ModelSerializer: the declared fields become a
+    values() projection plus one transform per field, so list responses
+    are built from row dicts without constructing model instances. The
+    output matches ``serializer_class(many=True).data`` exactly.
+    """
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            path, kind = self.compile_field(model, field)
+            self.fields.append((name, path, field, kind))
+        self.paths = list(dict.fromkeys(path for _, path, _, _ in self.fields))
+
+    def compile_field(self, model, field):
+        if isinstance(field, (serializers.BaseSerializer,
+                              serializers.SerializerMethodField,
+                              serializers.ManyRelatedField)) \
+                or field.source == '*':
+            raise NotCompilable(field.field_name)
+
+        model_field, related = None, model
+        for attr in field.source_attrs:
+            if related is None:
+                raise NotCompilable(field.field_name)
+            try:
+                model_field = related._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise NotCompilable(field.field_name)
+            related = model_field.related_model
+        path = '__'.join(field.source_attrs)
+
+        if isinstance(field, serializers.StringRelatedField):
+            # Only users have a __str__ we can turn into a column.
+            if related is None or related.__str__ is not AbstractBaseUser.__str__:
+                raise NotCompilable(field.field_name)
+            return path + '__' + related.USERNAME_FIELD, None
+        if isinstance(field, serializers.RelatedField) or related is not None:
+            raise NotCompilable(field.field_name)
+
+        for field_class, model_field_classes in PASSTHROUGH:
+            if isinstance(field, field_class) and \
+                    isinstance(model_field, model_field_classes):
+                return path, None
+        if isinstance(field, serializers.DateTimeField) and getattr(
+                field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601:
+            return path, 'datetime'
+        return path, 'field'
+
+    def values(self, queryset):
+        return queryset.values(*self.paths)
+
+    def bind(self):
+        """
+        Return a row -> dict function for the current request.
+        """
+        fields = []
+        for name, path, field, kind in self.fields:
+            if kind == 'datetime':
+                transform = iso_datetime(field)
+            elif kind == 'field':
+                transform = field.to_representation
+            else:
+                transform = None
+            fields.append((name, path, transform))
+
+        def to_representation(row):
+            data = {}
+            for name, path, transform in fields:
+                value = row[path]
+                if value is not None and transform is not None:
+                    value = transform(value)
+                data[name] = value
+            return data
+        return to_representation
+
+    def serialize(self, rows):
+        to_representation = self.bind()
+        with timed_serialization():
+            return [to_representation(row) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+class CompiledListMixin:
+    """
+    ``list()`` for generic views whose serializer compiles; filtering and
+    pagination run on the values() rows.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer_class())
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page))
+        return Response(compiled.serialize(queryset))
@@ -0,0 +1,96 @@
+import json
+
+from django.http import StreamingHttpResponse
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from moviesinfo.api.compiled import NotCompilable, compile_serializer
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def dumps(data):
+    # Same encoding options as JSONRenderer, so exports match the API.
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                      allow_nan=False, separators=(',', ':'))
+
+
+def frame(index, row, export):
+    if export == 'ndjson':
+        return dumps(row) + '\n'
+    return (',' if index else '') + dumps(row)
+
+
+def stream_rows(rows, export, rows_per_chunk=100):
+    buffer = []
+    if export == 'json':
+        yield '['
+    for index, row in enumerate(rows):
+        buffer.append(frame(index, row, export))
+        if len(buffer) >= rows_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+    if export == 'json':
+        yield ']'
+
+
+async def astream_rows(rows, export, rows_per_chunk=100):
+    buffer = []
+    index = 0
+    if export == 'json':
+        yield '['
+    async for row in rows:
+        buffer.append(frame(index, row, export))
+        index += 1
+        if len(buffer) >= rows_per_chunk:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+    if export == 'json':
+        yield ']'
+
+
+def check_export(export):
+    if export not in EXPORT_FORMATS:
+        raise ValidationError({'export': 'Choose one of: %s.' %
+                               ', '.join(EXPORT_FORMATS)})
+
+
+def export_response(queryset, serializer_class, export, chunk_size=1000):
+    check_export(export)
+    try:
+        compiled = compile_serializer(serializer_class)
+    except NotCompilable:
+        serializer = serializer_class()
+        rows = (serializer.to_representation(obj)
+                for obj in queryset.iterator(chunk_size=chunk_size))
+    else:
+        to_representation = compiled.bind()
+        rows = (to_representation(row) for row in
+                compiled.values(queryset).iterator(chunk_size=chunk_size))
+    return StreamingHttpResponse(stream_rows(rows, export),
+                                 content_type=EXPORT_FORMATS[export])
+
+
+def aexport_response(queryset, serializer_class, export, chunk_size=1000):
+    check_export(export)
+    try:
+        compiled = compile_serializer(serializer_class)
+    except NotCompilable:
+        serializer = serializer_class()
+        rows = (serializer.to_representation(obj)
+                async for obj in queryset.aiterator(chunk_size=chunk_size))
+    else:
+        to_representation = compiled.bind()
+        rows = (to_representation(row) async for row in
+                compiled.values(queryset).aiterator(chunk_size=chunk_size))
+    return StreamingHttpResponse(astream_rows(rows, export),
+                                 content_type=EXPORT_FORMATS[export])
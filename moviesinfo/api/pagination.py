@@ -1,5 +1,12 @@
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination, \
-                    LimitOffsetPagination, CursorPagination
+                    LimitOffsetPagination, CursorPagination, Cursor
 
 
 class MoviePagination(PageNumberPagination):
@@ -10,6 +17,12 @@ class MoviePagination(PageNumberPagination):
     last_page_strings = 'end'
 
 
+class MovieSearchPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'size'
+    max_page_size = 50
+
+
 class MovieLOPagination(LimitOffsetPagination):
     default_limit = 3
     max_limit = 10
@@ -17,7 +30,107 @@ class MovieLOPagination(LimitOffsetPagination):
     offset_query_param = 'start'
 
 
-class MovieCPagination(CursorPagination):
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on a unique composite ordering. The cursor holds the
+    last (created, id) seen and each page is a range seek on the matching
+    index, so page N costs the same as page 1 and rows inserted meanwhile
+    never shift rows onto or off a page already served.
+    """
+    ordering = ('created', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor.reverse
+        position = self.parse_position(cursor) if cursor else None
+
+        prefix = '-' if self.reverse else ''
+        queryset = queryset.order_by(*[prefix + field
+                                       for field in self.ordering])
+        if position is not None:
+            queryset = queryset.filter(self.seek(position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.position = cursor.position if cursor else None
+        return self.page
+
+    def seek(self, position):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        lookup = 'lt' if self.reverse else 'gt'
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, position))):
+            after = Q(**{'%s__%s' % (field, lookup): value})
+            condition = after if condition is None else \
+                after | (Q(**{field: value}) & condition)
+        return condition
+
+    def parse_position(self, cursor):
+        try:
+            position = json.loads(cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # A forged cursor must not reach the query as a 500.
+        created, pk = position
+        try:
+            created = parse_datetime(created)
+            pk = int(pk)
+        except (TypeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+        if created is None or timezone.is_naive(created):
+            raise NotFound(self.invalid_cursor_message)
+        return [created, pk]
+
+    def get_position(self, row):
+        values = []
+        for field in self.ordering:
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else value)
+        return json.dumps(values, separators=(',', ':'))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self.get_position(self.page[-1])
+        else:
+            position = self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False,
+                                         position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self.get_position(self.page[0])
+        else:
+            position = self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True,
+                                         position=position))
+
+
+class MovieCPagination(KeysetPagination):
     page_size = 5
-    ordering = 'created'
-    cursor_query_param = 'record'
\ No newline at end of file
+    cursor_query_param = 'record'
+
+
+class ReviewCPagination(KeysetPagination):
+    page_size = 20
+    page_size_query_param = 'size'
+    max_page_size = 100
\ No newline at end of file
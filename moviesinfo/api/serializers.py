@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from moviesinfo.models import Movies, Platform, Review
+from moviesinfo.models import Movies, MovieNeighbor, MovieScore, Platform, \
+                    PlatformStats, Review
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -11,13 +12,37 @@ class ReviewSerializer(serializers.ModelSerializer):
         # fields = "__all__"
 
 
+class ReviewBatchItemSerializer(serializers.ModelSerializer):
+    # Bounded to what the primary key column holds, so an out-of-range id
+    # is an item error rather than a failed lookup.
+    movies = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+    review_user = serializers.CharField(required=False)
+
+    class Meta:
+        model = Review
+        fields = ('movies', 'review_user', 'rating', 'description', 'active')
+        # Movies, users and duplicates are checked for the whole batch at
+        # once by the view instead of one query per item.
+        validators = []
+
+
 class MovieSerializer(serializers.ModelSerializer):
     # reviews = ReviewSerializer(many=True, read_only=True)
     platform = serializers.CharField(source='platform.name')
 
     class Meta:
         model = Movies
-        fields = "__all__"
+        exclude = ('rating_sum', 'rating_1', 'rating_2', 'rating_3',
+                   'rating_4', 'rating_5')
+
+
+class MovieDetailSerializer(MovieSerializer):
+    # Read from the counters on the movie row, not from its reviews.
+    rating_histogram = serializers.SerializerMethodField()
+
+    def get_rating_histogram(self, obj):
+        return {str(star): getattr(obj, 'rating_%d' % star)
+                for star in range(1, 6)}
 
 
 class PlatformSerializer(serializers.ModelSerializer):
@@ -28,6 +53,29 @@ class PlatformSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class PlatformStatsSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PlatformStats
+        exclude = ('rating_sum',)
+
+
+class MovieScoreSerializer(serializers.ModelSerializer):
+    movie = MovieSerializer(read_only=True)
+
+    class Meta:
+        model = MovieScore
+        fields = ('movie', 'bayesian', 'trending')
+
+
+class MovieNeighborSerializer(serializers.ModelSerializer):
+    movie = MovieSerializer(source='neighbor', read_only=True)
+
+    class Meta:
+        model = MovieNeighbor
+        fields = ('movie', 'score')
+
+
 # def name_length(value):
 #     if len(value) < 2:
 #         raise serializers.ValidationError("Name is too short!")
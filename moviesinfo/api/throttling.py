@@ -1,9 +1,93 @@
-from rest_framework.throttling import UserRateThrottle
+from django.db import connections, router
 
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle, \
+                    AnonRateThrottle, ScopedRateThrottle
 
-class ReviewCreateThrottle(UserRateThrottle):
+from moviesinfo.models import ThrottleCounter
+
+
+# Sliding window counter: only the current and previous window counts are
+# kept per key, and the row is updated by one atomic upsert that refuses to
+# count a request once the weighted estimate has reached the limit.
+ALLOW_SQL = """
+    INSERT INTO {table} ("key", "epoch", "count", "previous", "expires")
+    VALUES (%s, %s, 1, 0, %s)
+    ON CONFLICT ("key") DO UPDATE SET
+        "previous" = CASE WHEN "epoch" = excluded."epoch" THEN "previous"
+                          WHEN "epoch" = excluded."epoch" - 1 THEN "count"
+                          ELSE 0 END,
+        "count" = CASE WHEN "epoch" = excluded."epoch" THEN "count" + 1
+                       ELSE 1 END,
+        "epoch" = excluded."epoch",
+        "expires" = excluded."expires"
+    WHERE (CASE WHEN "epoch" = excluded."epoch" THEN "previous"
+                WHEN "epoch" = excluded."epoch" - 1 THEN "count"
+                ELSE 0 END) * %s
+        + (CASE WHEN "epoch" = excluded."epoch" THEN "count" ELSE 0 END) < %s
+    RETURNING "count"
+""".format(table=ThrottleCounter._meta.db_table)
+
+
+class SharedRateThrottle(SimpleRateThrottle):
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        epoch, offset = divmod(self.now, self.duration)
+        self.weight = 1 - offset / self.duration
+        alias = router.db_for_write(ThrottleCounter)
+        with connections[alias].cursor() as cursor:
+            cursor.execute(ALLOW_SQL, [
+                self.key, int(epoch), (epoch + 2) * self.duration,
+                self.weight, self.num_requests])
+            allowed = cursor.fetchone() is not None
+
+        return allowed or self.throttle_failure()
+
+    def wait(self):
+        counter = ThrottleCounter.objects.filter(key=self.key).first()
+        if counter is None:
+            return None
+
+        # A refused request leaves the row as it was, so roll it forward
+        # to the current window the way the upsert would have.
+        epoch, elapsed = divmod(self.now, self.duration)
+        count, previous = counter.count, counter.previous
+        if counter.epoch == int(epoch) - 1:
+            count, previous = 0, counter.count
+        elif counter.epoch != int(epoch):
+            count, previous = 0, 0
+
+        remaining = self.duration - elapsed
+        if count >= self.num_requests:
+            # The current window alone is full; it has to become the
+            # previous window and decay below the limit.
+            needed = 1 - self.num_requests / count
+            return remaining + needed * self.duration
+        if not previous:
+            return 0
+
+        needed = 1 - (self.num_requests - count) / previous
+        return max(needed * self.duration - elapsed, 0)
+
+
+class SharedAnonRateThrottle(AnonRateThrottle, SharedRateThrottle):
+    pass
+
+
+class SharedScopedRateThrottle(ScopedRateThrottle, SharedRateThrottle):
+    pass
+
+
+class ReviewCreateThrottle(UserRateThrottle, SharedRateThrottle):
     scope = 'review-create'
 
 
-class ReviewListThrottle(UserRateThrottle):
-    scope = 'review-list'
\ No newline at end of file
+class ReviewListThrottle(UserRateThrottle, SharedRateThrottle):
+    scope = 'review-list'
@@ -2,8 +2,12 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # from moviesinfo.api.views import movie_list, movie_details
 from moviesinfo.api.views import ReviewList, ReviewDetail, \
-            ReviewCreate, MoviesAV, MoviesDetailAV, PlatformAV, \
-            PlatformDetailAV, PlatformVS, UserReview, MoviesGV
+            ReviewCreate, ReviewBatchCreate, MoviesAV, MoviesDetailAV, \
+            PlatformAV, PlatformDetailAV, PlatformVS, UserReview, MoviesGV, \
+            MovieSearch, PlatformLeaderboard, TopRatedList, TrendingList, \
+            SimilarMovies
+from moviesinfo.api.async_views import MoviesAsyncAV, MoviesDetailAsyncAV, \
+            PlatformAsyncAV, PlatformDetailAsyncAV, ReviewListAsync
 
 router = DefaultRouter()
 router.register('stream', PlatformVS, basename='platform')
@@ -12,8 +16,15 @@ router.register('stream', PlatformVS, basename='platform')
 urlpatterns = [
     path('list/', MoviesAV.as_view(), name='movie-list'),
     path('<int:pk>/', MoviesDetailAV.as_view(), name='movie-detail'),
+    path('<int:pk>/similar/', SimilarMovies.as_view(), name='movie-similar'),
     path('list2/', MoviesGV.as_view(), name='watch-list'),
+    path('search/', MovieSearch.as_view(), name='movie-search'),
+    path('top-rated/', TopRatedList.as_view(), name='movie-top-rated'),
+    path('trending/', TrendingList.as_view(), name='movie-trending'),
 
+    # Before the router, whose stream/<pk>/ would swallow it.
+    path('stream/leaderboard/', PlatformLeaderboard.as_view(),
+         name='platform-leaderboard'),
     path('', include(router.urls)),
 
     # path('stream/', PlatformAV.as_view(), name='stream-list'),
@@ -24,5 +35,17 @@ urlpatterns = [
     path('<int:pk>/reviews/', ReviewList.as_view(), name='review-list'),
     path('review/<int:pk>/', ReviewDetail.as_view(), name='review-detail'),
     path('reviews/', UserReview.as_view(), name='user-review-detail'),
+    path('reviews/batch/', ReviewBatchCreate.as_view(), name='review-batch'),
+
+    # Async-native read path for ASGI deployments.
+    path('async/list/', MoviesAsyncAV.as_view(), name='async-movie-list'),
+    path('async/<int:pk>/', MoviesDetailAsyncAV.as_view(),
+         name='async-movie-detail'),
+    path('async/stream/', PlatformAsyncAV.as_view(),
+         name='async-platform-list'),
+    path('async/stream/<int:pk>/', PlatformDetailAsyncAV.as_view(),
+         name='async-platform-detail'),
+    path('async/<int:pk>/reviews/', ReviewListAsync.as_view(),
+         name='async-review-list'),
 
 ]
\ No newline at end of file
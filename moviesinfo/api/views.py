@@ -1,3 +1,5 @@
+from django.db import IntegrityError, transaction
+from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 
 from rest_framework.response import Response
@@ -10,26 +12,65 @@ from rest_framework import generics
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, \
                     IsAuthenticatedOrReadOnly
-from rest_framework.throttling import UserRateThrottle, \
-                    AnonRateThrottle, ScopedRateThrottle
 from rest_framework import filters
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from moviesinfo.api.permissions import IsAdminOrReadOnly, \
                         IsReviewUserOrReadOnly
-from moviesinfo.models import Movies, Platform, Review
+from moviesinfo.models import Movies, MovieNeighbor, MovieScore, Platform, \
+                    PlatformStats, Review
 from moviesinfo.api.serializers import MovieSerializer, \
-                        PlatformSerializer,ReviewSerializer
+                        PlatformSerializer,ReviewSerializer, \
+                        ReviewBatchItemSerializer, PlatformStatsSerializer, \
+                        MovieScoreSerializer, MovieNeighborSerializer, \
+                        MovieDetailSerializer
 from moviesinfo.api.throttling import ReviewCreateThrottle, \
-                        ReviewListThrottle
+                        ReviewListThrottle, SharedAnonRateThrottle, \
+                        SharedScopedRateThrottle
 from moviesinfo.api.pagination import MoviePagination, \
-                        MovieLOPagination, MovieCPagination
+                        MovieLOPagination, MovieCPagination, \
+                        MovieSearchPagination, ReviewCPagination
+from moviesinfo.api.cache import cache_response, bump_version, \
+                        conditional_response, conditional_rows
+from moviesinfo.api.compiled import CompiledListMixin, compile_serializer
+from moviesinfo.api.export import export_response
+from moviesinfo.purge import purge_movies, purge_platforms
+from moviesinfo.ratings import update_rating_aggregates
+from moviesinfo.search import search_movies
+from moviesinfo.tasks import review_changed
 
 
-class UserReview(generics.ListAPIView):
+def platform_queryset():
+    # Prefetching the reverse relation also caches each movie's platform,
+    # so the nested platform.name lookups cost no extra queries.
+    return Platform.objects.prefetch_related('movies')
+
+
+def movie_queryset():
+    return Movies.objects.select_related('platform')
+
+
+def columns(model, prefix=''):
+    return [prefix + field.name for field in model._meta.concrete_fields]
+
+
+def movie_rows(pk):
+    # Everything MovieDetailSerializer reads, for conditional_rows.
+    return Movies.objects.filter(pk=pk).values_list(
+        *columns(Movies), 'platform__name')
+
+
+def platform_rows(pk):
+    # The platform and each of its movies, as PlatformSerializer nests them.
+    return Platform.objects.filter(pk=pk).order_by('movies__id').values_list(
+        *columns(Platform), *columns(Movies, 'movies__'))
+
+
+class UserReview(CompiledListMixin, generics.ListAPIView):
     # queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewCPagination
     # permission_classes = [IsAuthenticated]
     # throttle_classes = [ReviewListThrottle, AnonRateThrottle]
 
@@ -38,7 +79,8 @@ class UserReview(generics.ListAPIView):
     #     return Review.objects.filter(review_user__username=username)
     def get_queryset(self):
         username = self.request.query_params.get('username', None)
-        return Review.objects.filter(review_user__username = username)
+        return Review.objects.select_related('review_user').filter(
+            review_user__username = username)
     
 
 class ReviewCreate(generics.CreateAPIView):
@@ -54,43 +96,152 @@ class ReviewCreate(generics.CreateAPIView):
         movies = Movies.objects.get(pk=pk)
 
         review_user = self.request.user
-        review_queryset = Review.objects.filter(
-            movies=movies, review_user=review_user)
 
-        if review_queryset.exists():
+        # The unique (movies, review_user) constraint settles races that a
+        # separate exists() check would let through.
+        try:
+            with transaction.atomic():
+                review = serializer.save(movies=movies,
+                                         review_user=review_user)
+                update_rating_aggregates(movies.pk, added=[review.rating])
+                review_changed(movies.platform_id)
+        except IntegrityError:
             raise ValidationError("You have already reviewed this movie!")
-
-        if movies.number_rating == 0:
-            movies.avg_rating = serializer.validated_data['rating']
-        else:
-            movies.avg_rating = (
-                movies.avg_rating + serializer.validated_data['rating'])/2
-
-        movies.number_rating = movies.number_rating + 1
-        movies.save()
-
-        serializer.save(movies=movies, review_user=review_user)
         
         
-class ReviewList(generics.ListAPIView):
+class ReviewBatchCreate(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = 'review-batch'
+    max_batch_size = 1000
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a list of reviews.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_batch_size:
+            return Response(
+                {'error': 'At most %d reviews per batch.' % self.max_batch_size},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        errors = {}
+        valid = []
+        for index, item in enumerate(items):
+            serializer = ReviewBatchItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors[index] = serializer.errors
+
+        reviews = self.resolve(request, valid, errors)
+        if reviews:
+            by_movie = {}
+            for review in reviews:
+                by_movie.setdefault(review.movies_id, []).append(review.rating)
+            try:
+                with transaction.atomic():
+                    Review.objects.bulk_create(reviews)
+                    for movie_id, ratings in by_movie.items():
+                        update_rating_aggregates(movie_id, added=ratings)
+                    review_changed(*{self.platforms[movie_id]
+                                     for movie_id in by_movie})
+            except IntegrityError:
+                return Response(
+                    {'error': 'Some of these reviews were created concurrently, '
+                              'retry the batch.'},
+                    status=status.HTTP_409_CONFLICT)
+            # bulk_create skips the post_save receivers.
+            bump_version(Review)
+
+        data = {
+            'created': len(reviews),
+            'errors': [{'index': index, 'errors': errors[index]}
+                       for index in sorted(errors)],
+        }
+        return Response(data, status=status.HTTP_201_CREATED if reviews
+                        else status.HTTP_400_BAD_REQUEST)
+
+    def resolve(self, request, valid, errors):
+        self.platforms = dict(Movies.objects.filter(
+            pk__in={data['movies'] for _, data in valid}).values_list(
+            'pk', 'platform_id'))
+
+        users = {request.user.username: request.user.pk}
+        usernames = {data['review_user'] for _, data in valid
+                     if 'review_user' in data}
+        if request.user.is_staff and usernames:
+            users.update(User.objects.filter(
+                username__in=usernames).values_list('username', 'pk'))
+
+        resolved = []
+        for index, data in valid:
+            username = data.pop('review_user', request.user.username)
+            if username not in users:
+                errors[index] = {'review_user': [
+                    'Only staff can post reviews for other users.'
+                    if not request.user.is_staff else 'Unknown user.']}
+            elif data['movies'] not in self.platforms:
+                errors[index] = {'movies': ['Movie not found.']}
+            else:
+                resolved.append((index, users[username], data))
+
+        existing = set(Review.objects.filter(
+            movies_id__in={data['movies'] for _, _, data in resolved},
+            review_user_id__in={user_id for _, user_id, _ in resolved},
+        ).values_list('movies_id', 'review_user_id'))
+
+        reviews = []
+        for index, user_id, data in resolved:
+            pair = (data.pop('movies'), user_id)
+            if pair in existing:
+                errors[index] = {'error': ['You have already reviewed this movie!']}
+                continue
+            existing.add(pair)
+            reviews.append(Review(movies_id=pair[0], review_user_id=user_id,
+                                  **data))
+        return reviews
+
+
+class ReviewList(CompiledListMixin, generics.ListAPIView):
     # queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewCPagination
     # permission_classes = [IsAuthenticated]
-    throttle_classes = [ReviewListThrottle, AnonRateThrottle]
+    throttle_classes = [ReviewListThrottle, SharedAnonRateThrottle]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['review_user__username', 'active']
 
     def get_queryset(self):
         pk = self.kwargs['pk']
-        return Review.objects.filter(movies=pk)
+        return Review.objects.select_related('review_user').filter(movies=pk)
+
+    @conditional_response(Review)
+    @cache_response(Review)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
 
 class ReviewDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Review.objects.all()
+    queryset = Review.objects.select_related('review_user', 'movies')
     serializer_class = ReviewSerializer
     permission_classes = [IsReviewUserOrReadOnly]
-    throttle_classes = [ScopedRateThrottle, AnonRateThrottle]
+    throttle_classes = [SharedScopedRateThrottle, SharedAnonRateThrottle]
     throttle_scope = 'review-detail'
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous = Review.objects.select_for_update().values_list(
+                'rating', flat=True).get(pk=serializer.instance.pk)
+            review = serializer.save()
+            update_rating_aggregates(review.movies_id, added=[review.rating],
+                                     removed=[previous])
+            review_changed(review.movies.platform_id)
+
+    def perform_destroy(self, instance):
+        # The Review post_delete receiver recounts the movie.
+        with transaction.atomic():
+            instance.delete()
     
     
 # class ReviewDetail(mixins.RetrieveModelMixin, generics.GenericAPIView):
@@ -114,13 +265,23 @@ class ReviewDetail(generics.RetrieveUpdateDestroyAPIView):
 
 class PlatformVS(viewsets.ViewSet):
 
+    def get_queryset(self):
+        return platform_queryset()
+
+    @cache_response(Platform, Movies, Review)
     def list(self, request):
-        queryset = Platform.objects.all()
+        queryset = self.get_queryset()
+        export = request.query_params.get('export')
+        if export:
+            return export_response(queryset, PlatformSerializer, export,
+                                   chunk_size=100)
         serializer = PlatformSerializer(queryset, many=True)
         return Response(serializer.data)
 
+    @conditional_rows(platform_rows)
+    @cache_response(Platform, Movies, Review)
     def retrieve(self, request, pk=None):
-        queryset = Platform.objects.all()
+        queryset = self.get_queryset()
         movies = get_object_or_404(queryset, pk=pk)
         serializer = PlatformSerializer(movies)
         return Response(serializer.data)
@@ -134,12 +295,90 @@ class PlatformVS(viewsets.ViewSet):
             return Response(serializer.errors)
 
 
+class PlatformLeaderboard(generics.ListAPIView):
+    queryset = PlatformStats.objects.all()
+    serializer_class = PlatformStatsSerializer
+    throttle_classes = [SharedAnonRateThrottle]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['name', 'movie_count', 'active_count', 'review_count',
+                       'avg_rating']
+    ordering = ['-avg_rating', 'platform']
+
+    @cache_response(Platform, Movies, Review, PlatformStats)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class LimitMixin:
+    default_limit = 10
+    max_limit = 100
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit',
+                                                      self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return max(1, min(limit, self.max_limit))
+
+
+class RankingList(LimitMixin, generics.ListAPIView):
+    # Scores are precomputed by refresh_rankings, so a page is a range read
+    # on the score index.
+    serializer_class = MovieScoreSerializer
+    throttle_classes = [SharedAnonRateThrottle]
+    ordering = None
+
+    def get_queryset(self):
+        return self.get_scores().select_related('movie__platform').order_by(
+            *self.ordering)[:self.get_limit()]
+
+    def get_scores(self):
+        return MovieScore.objects.filter(movie__active=True)
+
+    @cache_response(MovieScore, Movies, Platform)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class TopRatedList(RankingList):
+    ordering = ('-bayesian', 'movie')
+
+
+class TrendingList(RankingList):
+    ordering = ('-trending', 'movie')
+
+    def get_scores(self):
+        return super().get_scores().filter(trending__isnull=False)
+
+
+class SimilarMovies(LimitMixin, generics.ListAPIView):
+    # Neighbour lists are precomputed by refresh_similar.
+    serializer_class = MovieNeighborSerializer
+    throttle_classes = [SharedAnonRateThrottle]
+
+    def get_queryset(self):
+        return MovieNeighbor.objects.filter(
+            movie=self.kwargs['pk'], neighbor__active=True).select_related(
+                'neighbor__platform').order_by('-score', 'neighbor')[
+                    :self.get_limit()]
+
+    @cache_response(MovieNeighbor, Movies, Platform)
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Only an empty list pays for telling "no neighbours" from a
+        # missing movie.
+        if not response.data:
+            get_object_or_404(Movies, pk=self.kwargs['pk'])
+        return response
+
+
 class PlatformAV(APIView):
     permission_classes = [IsAdminOrReadOnly]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
 
     def get(self, request):
-        platform = Platform.objects.all()
+        platform = platform_queryset()
         serializer = PlatformSerializer(
             platform, many=True, context={'request': request})
         return Response(serializer.data)
@@ -155,11 +394,12 @@ class PlatformAV(APIView):
         
 class PlatformDetailAV(APIView):
     permission_classes = [IsAdminOrReadOnly]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
 
+    @conditional_rows(platform_rows)
     def get(self, request, pk):
         try:
-            platform = Platform.objects.get(pk=pk)
+            platform = platform_queryset().get(pk=pk)
         except Platform.DoesNotExist:
             return Response({'error': 'Not found'}, 
                             status=status.HTTP_404_NOT_FOUND)
@@ -180,15 +420,19 @@ class PlatformDetailAV(APIView):
 
     def delete(self, request, pk):
         platform = Platform.objects.get(pk=pk)
-        platform.delete()
+        purge_platforms(Platform.objects.filter(pk=platform.pk))
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     
-class MoviesGV(generics.ListAPIView):
-    queryset = Movies.objects.all()
+class MoviesGV(CompiledListMixin, generics.ListAPIView):
+    queryset = movie_queryset()
     serializer_class = MovieSerializer
     pagination_class = MovieCPagination
 
+    @cache_response(Movies, Platform, Review)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     # filter_backends = [DjangoFilterBackend]
     # filterset_fields = ['title', 'platform__name']
 
@@ -199,14 +443,28 @@ class MoviesGV(generics.ListAPIView):
     # ordering_fields  = ['avg_rating']
     
     
+class MovieSearch(CompiledListMixin, generics.ListAPIView):
+    serializer_class = MovieSerializer
+    pagination_class = MovieSearchPagination
+    throttle_classes = [SharedAnonRateThrottle]
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '')
+        return search_movies(movie_queryset(), query)
+
+
 class MoviesAV(APIView):
     permission_classes = [IsAdminOrReadOnly]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
 
+    @cache_response(Movies, Platform, Review)
     def get(self, request):
-        movies = Movies.objects.all()
-        serializer = MovieSerializer(movies, many=True)
-        return Response(serializer.data)
+        movies = movie_queryset()
+        export = request.query_params.get('export')
+        if export:
+            return export_response(movies, MovieSerializer, export)
+        compiled = compile_serializer(MovieSerializer)
+        return Response(compiled.serialize(compiled.values(movies)))
 
     def post(self, request):
         serializer = MovieSerializer(data=request.data)
@@ -219,21 +477,22 @@ class MoviesAV(APIView):
         
 class MoviesDetailAV(APIView):
     permission_classes = [IsAdminOrReadOnly]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
 
+    @conditional_rows(movie_rows)
     def get(self, request, pk):
         try:
-            movie = Movies.objects.get(pk=pk)
+            movie = movie_queryset().get(pk=pk)
         except Movies.DoesNotExist:
             return Response({'error': 'Not found'},
                             status=status.HTTP_404_NOT_FOUND)
 
-        serializer = MovieSerializer(movie)
+        serializer = MovieDetailSerializer(movie)
         return Response(serializer.data)
 
     def put(self, request, pk):
         movie = Movies.objects.get(pk=pk)
-        serializer = MovieSerializer(movie, data=request.data)
+        serializer = MovieDetailSerializer(movie, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -243,7 +502,7 @@ class MoviesDetailAV(APIView):
 
     def delete(self, request, pk):
         movie = Movies.objects.get(pk=pk)
-        movie.delete()
+        purge_movies(Movies.objects.filter(pk=movie.pk))
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MoviesinfoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moviesinfo'
+
+    def ready(self):
+        from moviesinfo import signals, tasks
@@ -0,0 +1,201 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+
+from rest_framework.authtoken.models import Token
+
+from moviesinfo.models import Movies, Platform, Review
+from moviesinfo.ratings import STARS, rebuild_platform_stats
+
+
+ADJECTIVES = [
+    'Silent', 'Broken', 'Golden', 'Hidden', 'Last', 'Midnight', 'Crimson',
+    'Frozen', 'Wild', 'Lost', 'Electric', 'Distant', 'Burning', 'Quiet',
+    'Savage', 'Endless', 'Hollow', 'Iron', 'Secret', 'Final',
+]
+NOUNS = [
+    'River', 'Empire', 'Horizon', 'Garden', 'Signal', 'Harbor', 'Kingdom',
+    'Mirror', 'Storm', 'Frontier', 'Station', 'Orchard', 'Voyage', 'Machine',
+    'Island', 'Witness', 'Summer', 'Circuit', 'Shadow', 'Ocean',
+]
+THEMES = [
+    'a family secret', 'an impossible heist', 'a voyage across the stars',
+    'a small town mystery', 'a fight for survival', 'a forbidden romance',
+    'a rogue detective', 'a war that changed everything',
+]
+
+# Timestamps are spread over the days before this moment rather than before
+# now, so a seed always produces the same rows.
+BASE_TIME = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class BulkWriter:
+    """
+    Inserts plain tuples with executemany, bypassing model instances and
+    signals. Columns that are not supplied get their field default.
+    """
+
+    def __init__(self, model, fields, batch_size):
+        quote = connection.ops.quote_name
+        supplied = [model._meta.get_field(name) for name in fields]
+        others = [field for field in model._meta.concrete_fields
+                  if field not in supplied]
+        columns = [field.column for field in supplied + others]
+
+        self.defaults = tuple(
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in others)
+        self.sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            quote(model._meta.db_table), ', '.join(map(quote, columns)),
+            ', '.join(['%s'] * len(columns)))
+        self.batch_size = batch_size
+        self.rows = []
+        self.written = 0
+
+    def add(self, row):
+        self.rows.append(row + self.defaults)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.rows)
+            self.written += len(self.rows)
+            self.rows = []
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def review_counts(movies, users, reviews, skew):
+    # Zipf-like popularity: a few hot movies take most of the reviews and a
+    # long tail gets a handful. A movie cannot have more reviews than users.
+    weights = [1 / (rank + 1) ** skew for rank in range(movies)]
+    total = sum(weights)
+    counts = [min(int(reviews * weight / total), users) for weight in weights]
+    remainder = min(reviews, movies * users) - sum(counts)
+    rank = 0
+    while remainder > 0:
+        if counts[rank % movies] < users:
+            counts[rank % movies] += 1
+            remainder -= 1
+        rank += 1
+    return counts
+
+
+def generate(platforms, movies, users, reviews, seed=0, skew=1.1,
+             days=730, batch_size=20000, progress=None, base_time=BASE_TIME):
+    if min(platforms, movies, users, reviews) < 0:
+        raise ValueError('Counts cannot be negative.')
+    if movies and not platforms:
+        raise ValueError('Movies need at least one platform.')
+    if reviews and not (movies and users):
+        raise ValueError('Reviews need at least one movie and one user.')
+
+    rng = random.Random(seed)
+    now = base_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    adapt = connection.ops.adapt_datetimefield_value
+    report = progress or (lambda message: None)
+
+    def moment():
+        return adapt(now - datetime.timedelta(seconds=rng.random() * days
+                                               * 86400))
+
+    platform_start = next_id(Platform)
+    movie_start = next_id(Movies)
+    user_start = next_id(User)
+    # The first user id marks the run, so usernames never collide with an
+    # earlier run or with users registered in between.
+    username = 'run%d-user%%d' % user_start
+    if User.objects.filter(username__startswith='run%d-' % user_start) \
+            .exists():
+        raise ValueError('Usernames of run %d are taken.' % user_start)
+
+    with transaction.atomic():
+        writer = BulkWriter(Platform, ['id', 'name', 'about', 'website'],
+                            batch_size)
+        for i in range(platforms):
+            writer.add((platform_start + i, 'Platform %d' % (platform_start + i),
+                        'Streams %s' % rng.choice(THEMES),
+                        'https://platform%d.example.com' % (platform_start + i)))
+        writer.flush()
+    report('%d platforms' % platforms)
+
+    # Every user shares one precomputed hash; hashing per user is what makes
+    # ORM-based seeding take hours.
+    password = make_password('Password@123')
+    user_writer = BulkWriter(User, ['id', 'username', 'email', 'password',
+                                    'date_joined'], batch_size)
+    token_writer = BulkWriter(Token, ['key', 'user_id', 'created'], batch_size)
+    with transaction.atomic():
+        for i in range(users):
+            user_id = user_start + i
+            joined = moment()
+            user_writer.add((user_id, username % i,
+                             (username % i) + '@example.com', password,
+                             joined))
+            # The user id keeps keys unique when a seed is reused.
+            token_writer.add(('%010x%030x' % (user_id, rng.getrandbits(120)),
+                              user_id, joined))
+        user_writer.flush()
+        token_writer.flush()
+    report('%d users and tokens' % users)
+
+    movie_writer = BulkWriter(Movies, [
+        'id', 'platform', 'title', 'storyline', 'active', 'created',
+        'rating_sum', 'number_rating', 'avg_rating', 'rating_1', 'rating_2',
+        'rating_3', 'rating_4', 'rating_5'], batch_size)
+    review_writer = BulkWriter(Review, [
+        'movies', 'review_user', 'rating', 'description', 'active',
+        'created', 'update'], batch_size)
+    counts = review_counts(movies, users, reviews, skew)
+
+    # Rows are buffered per movie and flushed movies first, so a chunk never
+    # holds a review whose movie row is still pending.
+    for i in range(movies):
+        movie_id = movie_start + i
+        quality = min(max(rng.gauss(3.4, 0.8), 1), 5)
+        ratings = []
+        for user_offset in rng.sample(range(users), counts[i]):
+            rating = min(max(round(rng.gauss(quality, 1.0)), 1), 5)
+            ratings.append(rating)
+            created = moment()
+            review_writer.rows.append((
+                movie_id, user_start + user_offset, rating,
+                'Rated %d stars' % rating, rng.random() > 0.05, created,
+                created) + review_writer.defaults)
+
+        total = sum(ratings)
+        movie_writer.rows.append((
+            movie_id, platform_start + rng.randrange(platforms),
+            '%s %s' % (rng.choice(ADJECTIVES), rng.choice(NOUNS)),
+            'A story about %s.' % rng.choice(THEMES), rng.random() > 0.1,
+            moment(), total, len(ratings),
+            total / len(ratings) if ratings else 0.0) +
+            tuple(ratings.count(star) for star in STARS) +
+            movie_writer.defaults)
+
+        # Either buffer can fill first: movies without reviews only grow
+        # the movie rows.
+        if len(review_writer.rows) >= batch_size or \
+                len(movie_writer.rows) >= batch_size or i == movies - 1:
+            with transaction.atomic():
+                movie_writer.flush()
+                review_writer.flush()
+            report('%d movies, %d reviews' % (movie_writer.written,
+                                              review_writer.written))
+    rebuild_platform_stats()
+
+    return {
+        'platforms': platforms,
+        'movies': movie_writer.written,
+        'users': users,
+        'tokens': users,
+        'reviews': review_writer.written,
+    }
@@ -0,0 +1,329 @@
+import gc
+import json
+import math
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_databases, \
+                    setup_test_environment, teardown_databases, \
+                    teardown_test_environment
+from django.urls import get_resolver, reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.api.throttling import SharedRateThrottle
+from moviesinfo.dataset import BASE_TIME, generate
+from moviesinfo.models import MovieNeighbor, Movies, MovieScore, Platform, \
+                        PlatformStats, Review
+from moviesinfo.rankings import refresh_rankings
+from moviesinfo.similarity import refresh_similar
+from userapp.api.authentication import token_cache
+
+
+# Checked against the cold request per route, with the response cache
+# invalidated first, so the budgets measure the route and not the cache.
+# Query budgets leave room for one token lookup on a cold token cache;
+# latencies are measured through the full middleware stack.
+DEFAULT_BUDGETS = {
+    'movie-list': {'queries': 2, 'p95_ms': 250},
+    'movie-detail': {'queries': 2, 'p95_ms': 50},
+    'watch-list': {'queries': 2, 'p95_ms': 50},
+    'movie-search': {'queries': 3, 'p95_ms': 50},
+    'api-root': {'queries': 1, 'p95_ms': 50},
+    'platform-list': {'queries': 3, 'p95_ms': 250},
+    'platform-detail': {'queries': 3, 'p95_ms': 100},
+    'platform-leaderboard': {'queries': 2, 'p95_ms': 50},
+    'movie-top-rated': {'queries': 2, 'p95_ms': 50},
+    'movie-trending': {'queries': 2, 'p95_ms': 50},
+    'movie-similar': {'queries': 2, 'p95_ms': 50},
+    'review-create': {'queries': 8, 'p95_ms': 50},
+    'review-list': {'queries': 2, 'p95_ms': 100},
+    'review-detail': {'queries': 2, 'p95_ms': 50},
+    'user-review-detail': {'queries': 2, 'p95_ms': 100},
+    'review-batch': {'queries': 10, 'p95_ms': 250},
+    'async-movie-list': {'queries': 2, 'p95_ms': 250},
+    'async-movie-detail': {'queries': 2, 'p95_ms': 50},
+    'async-platform-list': {'queries': 3, 'p95_ms': 250},
+    'async-platform-detail': {'queries': 3, 'p95_ms': 100},
+    'async-review-list': {'queries': 2, 'p95_ms': 100},
+    'login': {'queries': 3, 'p95_ms': 1000},
+    'register': {'queries': 5, 'p95_ms': 1000},
+    'logout': {'queries': 4, 'p95_ms': 50},
+}
+
+SCALES = {
+    'tiny': {'platforms': 3, 'movies': 30, 'users': 20, 'reviews': 200},
+    'small': {'platforms': 10, 'movies': 1000, 'users': 500, 'reviews': 20000},
+    'large': {'platforms': 50, 'movies': 20000, 'users': 10000,
+              'reviews': 500000},
+}
+
+
+# Everything a cache_response view is keyed on.
+CACHED_MODELS = (Platform, Movies, Review, PlatformStats, MovieScore,
+                 MovieNeighbor)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class Command(BaseCommand):
+    help = ('Seed a scaled dataset in a throwaway test database and drive '
+            'every API route through the test client, recording latency '
+            'percentiles, query counts and response sizes. Exits with an '
+            'error when a route exceeds its budget.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        for name in ('platforms', 'movies', 'users', 'reviews'):
+            parser.add_argument('--' + name, type=int,
+                                help='Override the scale preset.')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--budgets', help='JSON file of per-route '
+                            'budgets, merged over the defaults.')
+        parser.add_argument('--output', help='Write JSON results here.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the current database instead of a '
+                                 'throwaway test database. Everything the '
+                                 'benchmark writes is rolled back.')
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options['scale']])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+
+        budgets = dict(DEFAULT_BUDGETS)
+        if options['budgets']:
+            with open(options['budgets']) as handle:
+                for route, budget in json.load(handle).items():
+                    budgets[route] = {**budgets.get(route, {}), **budget}
+
+        if options['in_place']:
+            results = self.benchmark_in_place(sizes, options['iterations'])
+        else:
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                results = self.benchmark(sizes, options['iterations'])
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        violations = self.check_budgets(results, budgets)
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({'sizes': sizes, 'routes': results,
+                           'violations': violations}, handle, indent=2)
+        if violations:
+            raise CommandError('Budget exceeded:\n' + '\n'.join(violations))
+
+    def benchmark_in_place(self, sizes, iterations):
+        # One transaction around the whole run, rolled back at the end, so
+        # the seeded dataset and the benchmark user never stay behind.
+        try:
+            with transaction.atomic():
+                results = self.benchmark(sizes, iterations)
+                transaction.set_rollback(True)
+        finally:
+            # Responses cached during the run describe rolled-back rows.
+            for model in CACHED_MODELS:
+                bump_version(model)
+            token_cache.clear()
+        return results
+
+    def benchmark(self, sizes, iterations):
+        self.stdout.write('Seeding %s' % ', '.join(
+            '%d %s' % (count, name) for name, count in sizes.items()))
+        generate(**sizes)
+        # The dataset's reviews end at BASE_TIME; trending is measured there.
+        refresh_rankings(full=True, now=BASE_TIME)
+        refresh_similar(full=True)
+        token_cache.clear()
+
+        self.user = User.objects.create_user(
+            username='benchmark', password='Password@123', is_staff=True)
+        self.usernames = list(User.objects.exclude(
+            pk=self.user.pk).values_list('username', flat=True)[:50])
+        self.movie = Movies.objects.order_by('-number_rating').first()
+        self.review = Review.objects.filter(movies=self.movie).first()
+        platform = Platform.objects.first()
+        self.spare = [Movies.objects.create(
+            platform=platform, title='Spare %d' % i, storyline='Spare')
+            for i in range(iterations * 2)]
+
+        scenarios = self.scenarios()
+        missing = self.route_names() - set(scenarios)
+        if missing:
+            raise CommandError('No benchmark scenario for: ' +
+                               ', '.join(sorted(missing)))
+
+        results = {}
+        # Seeding leaves a large heap behind; without freezing it, a full
+        # collection lands in whichever request happens to trigger it.
+        gc.collect()
+        gc.freeze()
+        # Throttles would reject repeated calls long before the budgets.
+        try:
+            with mock.patch.object(SharedRateThrottle, 'allow_request',
+                                   return_value=True):
+                for name, scenario in scenarios.items():
+                    results[name] = self.run(scenario, iterations)
+        finally:
+            gc.unfreeze()
+        return results
+
+    def route_names(self):
+        names = set()
+        for namespace in ('moviesinfo.api.urls', 'userapp.api.urls'):
+            names.update(name for name in get_resolver(namespace).reverse_dict
+                         if isinstance(name, str))
+        return names
+
+    def scenarios(self):
+        movie, review = self.movie.pk, self.review.pk
+        username = self.review.review_user.username
+
+        def logout_setup(client, i):
+            token, _ = Token.objects.get_or_create(user=self.user)
+            client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        def batch(i):
+            return [{'movies': self.spare[-i - 1].pk, 'rating': 1 + n % 5,
+                     'review_user': name}
+                    for n, name in enumerate(self.usernames)]
+
+        return {
+            'movie-list': ('get', lambda i: reverse('movie-list')),
+            'movie-detail': ('get', lambda i: reverse(
+                'movie-detail', args=(movie,))),
+            'watch-list': ('get', lambda i: reverse('watch-list')),
+            # The noun of a generated title, so the search has hits at
+            # every scale.
+            'movie-search': ('get', lambda i: reverse(
+                'movie-search') + '?q=' + self.movie.title.split()[-1]),
+            'api-root': ('get', lambda i: reverse('api-root')),
+            'platform-list': ('get', lambda i: reverse('platform-list')),
+            'platform-detail': ('get', lambda i: reverse(
+                'platform-detail', args=(self.movie.platform_id,))),
+            'platform-leaderboard': ('get', lambda i: reverse(
+                'platform-leaderboard') + '?ordering=-review_count'),
+            'movie-top-rated': ('get', lambda i: reverse(
+                'movie-top-rated') + '?limit=20'),
+            'movie-trending': ('get', lambda i: reverse(
+                'movie-trending') + '?limit=20'),
+            'movie-similar': ('get', lambda i: reverse(
+                'movie-similar', args=(movie,))),
+            'review-create': ('post', lambda i: reverse(
+                'review-create', args=(self.spare[i].pk,)),
+                lambda i: {'rating': 4, 'description': 'Benchmark'}),
+            'review-list': ('get', lambda i: reverse(
+                'review-list', args=(movie,))),
+            'review-detail': ('get', lambda i: reverse(
+                'review-detail', args=(review,))),
+            'user-review-detail': ('get', lambda i: reverse(
+                'user-review-detail') + '?username=' + username),
+            'review-batch': ('post', lambda i: reverse('review-batch'),
+                             batch),
+            'async-movie-list': ('get', lambda i: reverse('async-movie-list')),
+            'async-movie-detail': ('get', lambda i: reverse(
+                'async-movie-detail', args=(movie,))),
+            'async-platform-list': ('get', lambda i: reverse(
+                'async-platform-list')),
+            'async-platform-detail': ('get', lambda i: reverse(
+                'async-platform-detail', args=(self.movie.platform_id,))),
+            'async-review-list': ('get', lambda i: reverse(
+                'async-review-list', args=(movie,))),
+            'login': ('post', lambda i: reverse('login'), lambda i: {
+                'username': 'benchmark', 'password': 'Password@123'}),
+            'register': ('post', lambda i: reverse('register'), lambda i: {
+                'username': 'register%d' % i,
+                'email': 'register%d@example.com' % i,
+                'password': 'Password@123', 'password2': 'Password@123'}),
+            'logout': ('post', lambda i: reverse('logout'), None,
+                       logout_setup),
+        }
+
+    def request(self, client, method, args, kwargs):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, method)(*args, **kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise CommandError('%s %s returned %d: %s' % (
+                method.upper(), args[0], response.status_code,
+                response.content[:200]))
+        return elapsed, len(context.captured_queries), len(response.content)
+
+    def run(self, scenario, iterations):
+        """
+        Time every iteration cold, after invalidating the response cache,
+        and repeat GETs once more warm. Budgets apply to the cold numbers.
+        """
+        method, url, data, setup = (tuple(scenario) + (None, None))[:4]
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.user)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        cold, warm = [], []
+        for i in range(iterations):
+            if setup:
+                setup(client, i)
+            kwargs = {'format': 'json'} if data else {}
+            args = (url(i), data(i)) if data else (url(i),)
+            for model in CACHED_MODELS:
+                bump_version(model)
+            cold.append(self.request(client, method, args, kwargs))
+            if method == 'get':
+                warm.append(self.request(client, method, args, kwargs))
+
+        timings, queries, sizes = zip(*cold)
+        result = {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': max(queries),
+            'bytes': max(sizes),
+            'warm_p50_ms': None,
+            'warm_p95_ms': None,
+            'warm_queries': None,
+        }
+        if warm:
+            timings, queries, _ = zip(*warm)
+            result.update({
+                'warm_p50_ms': round(percentile(timings, 50), 3),
+                'warm_p95_ms': round(percentile(timings, 95), 3),
+                'warm_queries': max(queries),
+            })
+        return result
+
+    def check_budgets(self, results, budgets):
+        violations = []
+        for route, result in results.items():
+            for metric, limit in budgets.get(route, {}).items():
+                if result[metric] > limit:
+                    violations.append('%s: %s %s > %s' % (
+                        route, metric, result[metric], limit))
+        return violations
+
+    def report(self, results):
+        self.stdout.write('%-24s %9s %9s %9s %8s %10s %9s %9s' % (
+            'route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'bytes',
+            'warm p50', 'warm p95'))
+        for route, result in results.items():
+            warm = ('%9.2f %9.2f' % (result['warm_p50_ms'],
+                                     result['warm_p95_ms'])
+                    if result['warm_p50_ms'] is not None
+                    else '%9s %9s' % ('-', '-'))
+            self.stdout.write('%-24s %9.2f %9.2f %9.2f %8d %10d %s' % (
+                route, result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                result['queries'], result['bytes'], warm))
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.db.utils import ConnectionHandler
+
+from imdbclone.database import sqlite_databases
+
+
+PROFILES = ('development', 'production')
+
+
+class Command(BaseCommand):
+    help = ('Run mixed reader and writer threads against a scratch SQLite '
+            'file under each database profile and report throughput and '
+            'lock errors.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=PROFILES, action='append',
+                            help='Profile to run; defaults to both.')
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-12s %10s %10s %8s %8s' % (
+            'profile', 'reads/s', 'writes/s', 'errors', 'p95 ms'))
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profile'] or PROFILES:
+                result = self.run(
+                    os.path.join(directory, profile + '.sqlite3'), profile,
+                    options['readers'], options['writers'],
+                    options['seconds'])
+                self.stdout.write('%-12s %10.0f %10.0f %8d %8.2f' % (
+                    profile, result['reads'] / options['seconds'],
+                    result['writes'] / options['seconds'],
+                    result['errors'], result['p95_ms']))
+
+    def run(self, path, profile, readers, writers, seconds):
+        handler = ConnectionHandler(sqlite_databases(path, profile))
+        with handler['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, '
+                           'counter INTEGER, body TEXT)')
+            cursor.executemany('INSERT INTO item (counter, body) VALUES '
+                               '(%s, %s)', [(i, 'x' * 200) for i in range(1000)])
+        handler['default'].close()
+
+        read_alias = 'replica' if 'replica' in handler.settings else 'default'
+        deadline = time.perf_counter() + seconds
+        results = {'reads': 0, 'writes': 0, 'errors': 0, 'timings': []}
+        lock = threading.Lock()
+
+        def read(cursor):
+            cursor.execute('SELECT id, counter, body FROM item '
+                           'ORDER BY id DESC LIMIT 20')
+            cursor.fetchall()
+
+        def write(cursor):
+            # Read-then-write, like the review and aggregate updates.
+            mode = handler['default'].transaction_mode or ''
+            cursor.execute('BEGIN %s' % mode)
+            cursor.execute('SELECT MAX(counter) FROM item')
+            top = cursor.fetchone()[0]
+            cursor.execute('INSERT INTO item (counter, body) VALUES (%s, %s)',
+                           (top + 1, 'x' * 200))
+            cursor.execute('COMMIT')
+
+        def worker(alias, operation, kind):
+            connection = handler[alias]
+            # Without CONN_MAX_AGE every request opens its own connection.
+            persistent = connection.settings_dict['CONN_MAX_AGE'] != 0
+            done, errors, timings = 0, 0, []
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    with connection.cursor() as cursor:
+                        operation(cursor)
+                    done += 1
+                except DatabaseError:
+                    errors += 1
+                    connection.close()
+                timings.append(time.perf_counter() - start)
+                if not persistent:
+                    connection.close()
+            connection.close()
+            with lock:
+                results[kind] += done
+                results['errors'] += errors
+                results['timings'].extend(timings)
+
+        threads = [threading.Thread(target=worker,
+                                    args=(read_alias, read, 'reads'))
+                   for _ in range(readers)]
+        threads += [threading.Thread(target=worker,
+                                     args=('default', write, 'writes'))
+                    for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        timings = sorted(results.pop('timings')) or [0]
+        results['p95_ms'] = timings[max(int(len(timings) * 0.95) - 1, 0)] \
+            * 1000
+        return results
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, \
+                    teardown_databases, teardown_test_environment
+
+from rest_framework.renderers import JSONRenderer
+
+from moviesinfo.api.compiled import compile_serializer
+from moviesinfo.api.serializers import MovieSerializer, ReviewSerializer
+from moviesinfo.dataset import generate
+from moviesinfo.models import Movies, Review
+
+
+class Command(BaseCommand):
+    help = ('Compare DRF serialization with the compiled read path on large '
+            'movie and review lists in a throwaway test database. Fails if '
+            'the rendered bytes differ.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the current database instead of a '
+                                 'throwaway test database.')
+
+    def handle(self, *args, **options):
+        if options['in_place']:
+            self.benchmark(options['rows'], options['runs'])
+            return
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.benchmark(options['rows'], options['runs'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def benchmark(self, rows, runs):
+        generate(platforms=10, movies=rows, users=max(rows // 10, 10),
+                 reviews=rows)
+        cases = [
+            ('movies', MovieSerializer,
+             Movies.objects.select_related('platform')),
+            ('reviews', ReviewSerializer,
+             Review.objects.select_related('review_user')),
+        ]
+        for label, serializer_class, queryset in cases:
+            self.compare(label, serializer_class, queryset, runs)
+
+    def compare(self, label, serializer_class, queryset, runs):
+        compiled = compile_serializer(serializer_class)
+        renderer = JSONRenderer()
+
+        def drf():
+            return serializer_class(queryset.all(), many=True).data
+
+        def fast():
+            return compiled.serialize(compiled.values(queryset.all()))
+
+        timings = {}
+        for name, build in (('drf', drf), ('compiled', fast)):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                data = build()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = (statistics.median(samples),
+                             renderer.render(data))
+
+        if timings['drf'][1] != timings['compiled'][1]:
+            raise CommandError('%s: compiled output differs from DRF.' % label)
+        self.stdout.write('%-8s %6d rows  drf %8.1f ms  compiled %8.1f ms  '
+                          '%.1fx' % (label, queryset.count(),
+                                     timings['drf'][0],
+                                     timings['compiled'][0],
+                                     timings['drf'][0] /
+                                     timings['compiled'][0]))
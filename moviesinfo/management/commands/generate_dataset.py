@@ -0,0 +1,64 @@
+import time
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.dataset import BASE_TIME, generate
+from moviesinfo.models import Movies, Platform, Review
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset of platforms, '
+            'movies, users, tokens and reviews with bulk inserts, skewed '
+            'review popularity and precomputed rating aggregates.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', type=int, default=20)
+        parser.add_argument('--movies', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--reviews', type=int, default=2000000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of movie popularity.')
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument(
+            '--base-time', default=BASE_TIME.isoformat(),
+            help='Timestamps fall in the two years before this ISO datetime '
+                 '(UTC unless it says otherwise).')
+
+    def handle(self, *args, **options):
+        base_time = parse_datetime(options['base_time'])
+        if base_time is None:
+            raise CommandError('--base-time: expected an ISO datetime.')
+        if timezone.is_naive(base_time):
+            base_time = base_time.replace(tzinfo=dt_timezone.utc)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        start = time.perf_counter()
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Durability is not worth the fsyncs for a throwaway dataset.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        try:
+            counts = generate(
+                options['platforms'], options['movies'], options['users'],
+                options['reviews'], seed=options['seed'],
+                skew=options['skew'], batch_size=options['batch_size'],
+                progress=self.stdout.write, base_time=base_time)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for model in (Platform, Movies, Review):
+            bump_version(model)
+
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %d rows in %.1fs (%d rows/s): %s' % (
+                rows, elapsed, rows / elapsed,
+                ', '.join('%d %s' % (n, name) for name, n in counts.items()))))
@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.exceptions import ValidationError
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.api.serializers import MovieSerializer, PlatformSerializer
+from moviesinfo.models import ImportCheckpoint, Movies, Platform, \
+                        PlatformStats
+from moviesinfo.ratings import refresh_platform_stats, \
+                        update_platform_stats
+
+
+def read_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as handle:
+        if extension == '.csv':
+            yield from csv.DictReader(handle)
+        elif extension in ('.ndjson', '.jsonl'):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise CommandError('%s: expected a .csv or .ndjson file.' % path)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Import platforms and movies from CSV or NDJSON files in '
+            'validated, chunked bulk writes. Progress is checkpointed with '
+            'each chunk, so an interrupted import resumes where it stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platforms', help='Platforms file.')
+        parser.add_argument('--movies', help='Movies file.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore saved checkpoints.')
+
+    def handle(self, *args, **options):
+        if not options['platforms'] and not options['movies']:
+            raise CommandError('Pass --platforms and/or --movies.')
+
+        # Platform names resolve to ids in memory instead of one query per
+        # movie row.
+        self.platform_ids = dict(Platform.objects.values_list('name', 'id'))
+
+        if options['platforms']:
+            self.run('platforms', options['platforms'], PlatformSerializer,
+                     self.write_platforms, options)
+            bump_version(Platform)
+        if options['movies']:
+            self.run('movies', options['movies'], MovieSerializer,
+                     self.write_movies, options)
+            bump_version(Movies)
+
+    def run(self, kind, path, serializer_class, write, options):
+        source = '%s:%s' % (kind, os.path.abspath(path))
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+        if options['restart']:
+            checkpoint.position = 0
+        start = checkpoint.position
+        if start:
+            self.stdout.write('%s: resuming after row %d' % (kind, start))
+
+        validator = serializer_class()
+        position, written, failed = start, 0, 0
+        rows = islice(read_rows(path), start, None)
+        for batch in batches(rows, options['batch_size']):
+            valid = []
+            for offset, row in enumerate(batch, start=position + 1):
+                try:
+                    valid.append((offset, validator.run_validation(row)))
+                except ValidationError as exc:
+                    failed += 1
+                    self.stderr.write('%s row %d: %s' % (kind, offset,
+                                                         exc.detail))
+
+            position += len(batch)
+            with transaction.atomic():
+                count = write(valid)
+                checkpoint.position = position
+                checkpoint.save()
+            written += count
+            failed += len(valid) - count
+            self.stdout.write('%s: %d rows read, %d written, %d rejected' % (
+                kind, position, written, failed))
+
+        self.stdout.write(self.style.SUCCESS(
+            '%s: done, %d written, %d rejected' % (kind, written, failed)))
+
+    def write_platforms(self, valid):
+        latest = {data['name']: data for _, data in valid}
+        existing = Platform.objects.in_bulk(
+            [self.platform_ids[name] for name in latest
+             if name in self.platform_ids])
+
+        created, updated = [], []
+        for name, data in latest.items():
+            platform = existing.get(self.platform_ids.get(name))
+            if platform is None:
+                created.append(Platform(**data))
+            else:
+                platform.about = data['about']
+                platform.website = data['website']
+                updated.append(platform)
+
+        Platform.objects.bulk_create(created)
+        Platform.objects.bulk_update(updated, ['about', 'website'])
+        # bulk_create skips the receiver that adds the stats row.
+        PlatformStats.objects.bulk_create([
+            PlatformStats(platform=platform, name=platform.name)
+            for platform in created])
+        self.platform_ids.update((platform.name, platform.pk)
+                                 for platform in created)
+        return len(valid)
+
+    def write_movies(self, valid):
+        # (platform, title) is the natural key, so a restarted or repeated
+        # import updates the movies it already wrote instead of adding them
+        # again. As with platforms, the last row for a key wins.
+        latest = {}
+        for offset, data in valid:
+            platform_id = self.platform_ids.get(data['platform']['name'])
+            if platform_id is None:
+                self.stderr.write('movies row %d: unknown platform %r' % (
+                    offset, data['platform']['name']))
+                continue
+            latest[platform_id, data['title']] = data
+        existing = {}
+        for movie in Movies.objects.filter(
+                platform_id__in={platform_id for platform_id, _ in latest},
+                title__in={title for _, title in latest}).order_by('-pk'):
+            existing[movie.platform_id, movie.title] = movie
+
+        created, updated, flipped = [], [], set()
+        for (platform_id, title), data in latest.items():
+            active = data.get('active', True)
+            movie = existing.get((platform_id, title))
+            if movie is None:
+                created.append(Movies(
+                    platform_id=platform_id, title=title,
+                    storyline=data['storyline'], active=active))
+                continue
+            if movie.active != active:
+                flipped.add(platform_id)
+            movie.storyline = data['storyline']
+            movie.active = active
+            updated.append(movie)
+
+        Movies.objects.bulk_create(created)
+        Movies.objects.bulk_update(updated, ['storyline', 'active'])
+        added = Counter((movie.platform_id, movie.active) for movie in created)
+        for platform_id in {platform_id for platform_id, _ in added}:
+            update_platform_stats(
+                platform_id,
+                movies=added[platform_id, True] + added[platform_id, False],
+                active=added[platform_id, True])
+        if flipped:
+            refresh_platform_stats(flipped)
+        return sum(1 for _, data in valid
+                   if data['platform']['name'] in self.platform_ids)
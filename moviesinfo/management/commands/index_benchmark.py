@@ -0,0 +1,125 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from moviesinfo.models import Movies, Review
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Show query plans and latencies of the API hot paths with and '
+            'without the indexes declared on Movies and Review. Run it '
+            'against a large dataset; nothing is changed permanently.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--json', action='store_true',
+                            help='Print machine-readable results.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_benchmark only supports SQLite.')
+
+        # The most reviewed movie is the worst case for the review paths.
+        movie = Movies.objects.order_by('-number_rating').first()
+        reviews = Review.objects.select_related('movies', 'review_user')
+        review = reviews.filter(movies=movie).first() or reviews.first()
+        if review is None:
+            raise CommandError('Load some reviews before benchmarking.')
+
+        queries = self.hot_queries(review.movies, review.review_user)
+        results = {'after': self.measure(queries, options['runs'])}
+
+        try:
+            with transaction.atomic():
+                self.drop_indexes()
+                results['before'] = self.measure(
+                    queries, options['runs'], before=True)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+    def hot_queries(self, movie, user):
+        return [
+            ('duplicate-review', 'movies_id', Review.objects.filter(
+                movies=movie, review_user=user).values('id')[:1]),
+            ('review-list', 'movies_id', Review.objects.select_related(
+                'review_user').filter(movies=movie).order_by(
+                'created', 'id')[:21]),
+            ('review-list-active', 'movies_id', Review.objects.select_related(
+                'review_user').filter(movies=movie, active=True).order_by(
+                'created', 'id')[:21]),
+            ('user-review', 'review_user_id', Review.objects.select_related(
+                'review_user').filter(review_user__username=user.username)
+                .order_by('created', 'id')[:21]),
+            ('movie-cursor', None, Movies.objects.select_related(
+                'platform').order_by('created', 'id')[:6]),
+        ]
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Movies, Review):
+                for index in model._meta.indexes:
+                    cursor.execute('DROP INDEX "%s"' % index.name)
+
+    def foreign_key_index(self, column):
+        # Before the migration the review table only had its foreign key
+        # indexes. SQLite cannot drop the index backing the unique
+        # constraint, so the old plan is pinned with INDEXED BY instead.
+        table = Review._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA index_list("%s")' % table)
+            for row in cursor.fetchall():
+                cursor.execute('PRAGMA index_info("%s")' % row[1])
+                if [info[2] for info in cursor.fetchall()] == [column]:
+                    return row[1]
+
+    def measure(self, queries, runs, before=False):
+        results = {}
+        table = '"%s"' % Review._meta.db_table
+        with connection.cursor() as cursor:
+            for label, column, queryset in queries:
+                sql, params = queryset.query.sql_with_params()
+                if before and column:
+                    sql = sql.replace(
+                        'FROM %s' % table, 'FROM %s INDEXED BY "%s"' %
+                        (table, self.foreign_key_index(column)), 1)
+
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    rows = len(cursor.fetchall())
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                results[label] = {
+                    'plan': plan,
+                    'rows': rows,
+                    'median_ms': round(statistics.median(timings), 3),
+                    'max_ms': round(max(timings), 3),
+                }
+        return results
+
+    def report(self, results):
+        for label, after in results['after'].items():
+            before = results['before'][label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            for name, result in (('before', before), ('after', after)):
+                self.stdout.write('  %-6s %9.3f ms median, %d rows' % (
+                    name, result['median_ms'], result['rows']))
+                for step in result['plan']:
+                    self.stdout.write('         ' + step)
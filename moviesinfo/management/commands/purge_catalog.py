@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesinfo.models import Movies, Platform
+from moviesinfo.purge import purge_movies, purge_platforms
+
+
+class Command(BaseCommand):
+    help = ('Delete platforms or movies with everything that depends on '
+            'them, in bounded batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--platform', type=int, action='append', default=[],
+            help='Id of a platform to delete; may be repeated.')
+        parser.add_argument(
+            '--movie', type=int, action='append', default=[],
+            help='Id of a movie to delete; may be repeated.')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Rows per transaction; defaults to PURGE_BATCH_SIZE.')
+
+    def progress(self, model, deleted):
+        self.stdout.write(f'{model._meta.label}: {deleted} deleted')
+
+    def handle(self, *args, **options):
+        if not options['platform'] and not options['movie']:
+            raise CommandError('Pass at least one --platform or --movie.')
+
+        kwargs = {'batch_size': options['batch_size'],
+                  'progress': self.progress}
+        deleted = {}
+        if options['movie']:
+            deleted.update(purge_movies(
+                Movies.objects.filter(pk__in=options['movie']), **kwargs))
+        if options['platform']:
+            for label, count in purge_platforms(
+                    Platform.objects.filter(pk__in=options['platform']),
+                    **kwargs).items():
+                deleted[label] = deleted.get(label, 0) + count
+
+        summary = ', '.join(f'{count} {label}'
+                            for label, count in sorted(deleted.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {summary or "nothing"}.'))
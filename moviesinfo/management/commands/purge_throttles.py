@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from moviesinfo.models import ThrottleCounter
+
+
+class Command(BaseCommand):
+    help = 'Delete throttle counters whose windows have fully expired.'
+
+    def handle(self, *args, **options):
+        deleted, _ = ThrottleCounter.objects.filter(
+            expires__lt=time.time()).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired throttle counters.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from moviesinfo.ratings import rebuild_platform_stats, \
+                        rebuild_rating_aggregates, verify_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = ('Recompute rating sum, count, average and star histogram for '
+            'every movie, then the per-platform stats.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only check the stored counters against the reviews and '
+                 'fail if any movie disagrees.')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatched = verify_rating_aggregates()
+            if mismatched:
+                raise CommandError(
+                    '%d movies have counters that disagree with their '
+                    'reviews: %s' % (len(mismatched),
+                                     ', '.join(map(str, mismatched[:20]))))
+            self.stdout.write(self.style.SUCCESS(
+                'Rating counters match the reviews.'))
+            return
+
+        updated = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rating aggregates for {updated} movies.'))
+        updated = rebuild_platform_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats for {updated} platforms.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from moviesinfo.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = ('Update the top-rated and trending scores from the reviews added '
+            'since the last run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rescore every movie instead of only the recently reviewed '
+                 'ones.')
+
+    def handle(self, *args, **options):
+        updated = refresh_rankings(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated rankings for {updated} movies.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from moviesinfo.similarity import refresh_similar
+
+
+class Command(BaseCommand):
+    help = ('Update the similar-movies lists for movies whose reviews changed '
+            'since the last run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every list, which also accounts for deleted '
+                 'reviews.')
+
+    def handle(self, *args, **options):
+        updated = refresh_similar(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated similar movies for {updated} movies.'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from moviesinfo.models import Task
+from moviesinfo.queue import queue_stats, run_workers
+
+
+class Command(BaseCommand):
+    help = ('Run queued background tasks such as platform stats, rankings '
+            'and cache warming.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker threads, one connection each.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no task is due instead of '
+                                 'polling.')
+        parser.add_argument('--status', action='store_true',
+                            help='Print the queue and the failed tasks, then '
+                                 'exit.')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.print_status()
+            return
+
+        succeeded, failed = run_workers(options['workers'],
+                                        drain=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            '%d tasks done, %d failed or retried' % (succeeded, failed)))
+
+    def print_status(self):
+        stats = queue_stats()
+        self.stdout.write('pending %d, running %d, failed %d, oldest due '
+                          '%.1fs' % (stats[Task.PENDING], stats[Task.RUNNING],
+                                     stats[Task.FAILED],
+                                     stats['oldest_due_seconds']))
+        for task in Task.objects.filter(status=Task.FAILED).order_by('id'):
+            error = task.last_error.strip().splitlines()
+            self.stdout.write('failed #%d %s%s after %d attempts: %s' % (
+                task.pk, task.name, task.args, task.attempts,
+                error[-1] if error else ''))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:52
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, \
+                    Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movies = apps.get_model('moviesinfo', 'Movies')
+    Review = apps.get_model('moviesinfo', 'Review')
+
+    reviews = Review.objects.filter(
+        movies=OuterRef('pk')).order_by().values('movies')
+    Movies.objects.update(
+        rating_sum=Coalesce(Subquery(
+            reviews.annotate(total=Sum('rating')).values('total')), 0),
+        number_rating=Coalesce(Subquery(
+            reviews.annotate(total=Count('pk')).values('total')), 0))
+    Movies.objects.update(avg_rating=Coalesce(
+        Cast(F('rating_sum'), FloatField()) /
+        NullIf(F('number_rating'), Value(0)), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movies',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, \
+                    Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def drop_duplicate_reviews(apps, schema_editor):
+    # Keep the newest review of each (movie, user) pair so the unique
+    # constraint can be added, then recount the movies that lost reviews.
+    Movies = apps.get_model('moviesinfo', 'Movies')
+    Review = apps.get_model('moviesinfo', 'Review')
+
+    duplicates = Review.objects.filter(Exists(Review.objects.filter(
+        Q(created__gt=OuterRef('created')) |
+        Q(created=OuterRef('created'), pk__gt=OuterRef('pk')),
+        movies=OuterRef('movies'), review_user=OuterRef('review_user'))))
+    movie_ids = set(duplicates.values_list('movies', flat=True))
+    if not movie_ids:
+        return
+    duplicates.delete()
+
+    movies = Movies.objects.filter(pk__in=movie_ids)
+    reviews = Review.objects.filter(
+        movies=OuterRef('pk')).order_by().values('movies')
+    movies.update(
+        rating_sum=Coalesce(Subquery(
+            reviews.annotate(total=Sum('rating')).values('total')), 0),
+        number_rating=Coalesce(Subquery(
+            reviews.annotate(total=Count('pk')).values('total')), 0))
+    movies.update(avg_rating=Coalesce(
+        Cast(F('rating_sum'), FloatField()) /
+        NullIf(F('number_rating'), Value(0)), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0002_movies_rating_sum'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_reviews,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('movies', 'review_user'), name='unique_review_per_user'),
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['created'], name='movies_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movies', 'active'], name='review_movie_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('active', True)), fields=['movies', 'created'], name='review_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['review_user', 'created'], name='review_user_created_idx'),
+        ),
+    ]
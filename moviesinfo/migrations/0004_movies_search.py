@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:58
+
+from django.db import migrations
+
+from moviesinfo.search import create_search_index, drop_search_index
+
+
+def forwards(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0003_review_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
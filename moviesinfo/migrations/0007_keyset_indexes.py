@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0006_importcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movies',
+            name='movies_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_active_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movies',
+            index=models.Index(fields=['created', 'id'], name='movies_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movies', 'created', 'id'], name='review_movie_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('active', True)), fields=['movies', 'created', 'id'], name='review_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['review_user', 'created', 'id'], name='review_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, \
+                    Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_platform_stats(apps, schema_editor):
+    Platform = apps.get_model('moviesinfo', 'Platform')
+    Movies = apps.get_model('moviesinfo', 'Movies')
+    PlatformStats = apps.get_model('moviesinfo', 'PlatformStats')
+
+    PlatformStats.objects.bulk_create([
+        PlatformStats(platform_id=pk, name=name)
+        for pk, name in Platform.objects.values_list('pk', 'name')])
+
+    movies = Movies.objects.filter(
+        platform=OuterRef('platform')).order_by().values('platform')
+    PlatformStats.objects.update(
+        movie_count=Coalesce(Subquery(
+            movies.annotate(total=Count('pk')).values('total')), 0),
+        active_count=Coalesce(Subquery(
+            movies.annotate(total=Count('pk', filter=Q(active=True)))
+            .values('total')), 0),
+        review_count=Coalesce(Subquery(
+            movies.annotate(total=Sum('number_rating')).values('total')), 0),
+        rating_sum=Coalesce(Subquery(
+            movies.annotate(total=Sum('rating_sum')).values('total')), 0))
+    PlatformStats.objects.update(avg_rating=Coalesce(
+        Cast(F('rating_sum'), FloatField()) /
+        NullIf(F('review_count'), Value(0)), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('platform', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='moviesinfo.platform')),
+                ('name', models.CharField(max_length=30)),
+                ('movie_count', models.IntegerField(default=0)),
+                ('active_count', models.IntegerField(default=0)),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('avg_rating', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_platform_stats,
+                             migrations.RunPython.noop),
+    ]
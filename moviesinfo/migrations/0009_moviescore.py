@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0008_platformstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieScore',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='moviesinfo.movies')),
+                ('bayesian', models.FloatField()),
+                ('trending', models.FloatField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bayesian', 'movie'], name='score_bayesian_idx'), models.Index(fields=['-trending', 'movie'], name='score_trending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0009_moviescore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='moviesinfo.movies')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='moviesinfo.movies')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['movie', '-score', 'neighbor'], name='neighbor_movie_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'neighbor'), name='unique_movie_neighbor')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from moviesinfo.search import create_search_index
+
+
+def backfill_rating_histogram(apps, schema_editor):
+    Movies = apps.get_model('moviesinfo', 'Movies')
+    Review = apps.get_model('moviesinfo', 'Review')
+
+    reviews = Review.objects.filter(
+        movies=OuterRef('pk')).order_by().values('movies')
+    Movies.objects.update(**{
+        'rating_%d' % star: Coalesce(Subquery(
+            reviews.filter(rating=star).annotate(
+                total=Count('pk')).values('total')), 0)
+        for star in range(1, 6)})
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding the columns remakes the movies table on SQLite, which drops
+    # the search triggers.
+    create_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0010_movieneighbor'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop,
+                             reinstall_search_index),
+        migrations.AddField(
+            model_name='movies',
+            name='rating_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movies',
+            name='rating_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movies',
+            name='rating_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movies',
+            name='rating_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movies',
+            name='rating_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_histogram,
+                             migrations.RunPython.noop),
+        migrations.RunPython(reinstall_search_index,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+
+
+def drop_duplicate_running_tasks(apps, schema_editor):
+    # Overlapping runs of one key could exist before the constraint; the
+    # most recently started one carries on and does the same work.
+    Task = apps.get_model('moviesinfo', 'Task')
+    Task.objects.filter(status='running').filter(Exists(Task.objects.filter(
+        Q(started__gt=OuterRef('started')) |
+        Q(started=OuterRef('started'), pk__gt=OuterRef('pk')),
+        status='running', key=OuterRef('key')))).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0012_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_running_tasks,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('key',), name='unique_running_task'),
+        ),
+    ]
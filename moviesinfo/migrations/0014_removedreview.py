@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moviesinfo', '0013_task_unique_running'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemovedReview',
+            fields=[
+                ('movie', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
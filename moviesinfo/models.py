@@ -23,8 +23,20 @@ class Movies(models.Model):
     active = models.BooleanField(default=True)
     avg_rating = models.FloatField(default=0)
     number_rating = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    # Number of reviews with each star rating.
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created', 'id'], name='movies_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -40,6 +52,148 @@ class Review(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     update = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movies', 'review_user'],
+                                    name='unique_review_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['movies', 'active'],
+                         name='review_movie_active_idx'),
+            models.Index(fields=['movies', 'created', 'id'],
+                         name='review_movie_created_idx'),
+            models.Index(fields=['movies', 'created', 'id'],
+                         condition=models.Q(active=True),
+                         name='review_active_created_idx'),
+            models.Index(fields=['review_user', 'created', 'id'],
+                         name='review_user_created_idx'),
+        ]
+
     def __str__(self):
         return str(self.rating) + " | " + \
-        self.movies.title + " | " + str(self.review_user)
\ No newline at end of file
+        self.movies.title + " | " + str(self.review_user)
+
+
+class ThrottleCounter(models.Model):
+    key = models.CharField(max_length=255, primary_key=True)
+    epoch = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    previous = models.PositiveIntegerField(default=0)
+    expires = models.FloatField()
+
+    def __str__(self):
+        return self.key
+
+
+class ImportCheckpoint(models.Model):
+    source = models.CharField(max_length=255, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.source + " | " + str(self.position)
+
+
+class PlatformStats(models.Model):
+    platform = models.OneToOneField(Platform, on_delete=models.CASCADE,
+                                    primary_key=True, related_name='stats')
+    # Copied so the leaderboard is answered from this table alone.
+    name = models.CharField(max_length=30)
+    movie_count = models.IntegerField(default=0)
+    active_count = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.name + " | " + str(self.movie_count)
+
+
+class MovieScore(models.Model):
+    movie = models.OneToOneField(Movies, on_delete=models.CASCADE,
+                                 primary_key=True, related_name='score')
+    bayesian = models.FloatField()
+    # log2 of the decayed review weight relative to RANKING_EPOCH; null
+    # until the movie has a recent review.
+    trending = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bayesian', 'movie'],
+                         name='score_bayesian_idx'),
+            models.Index(fields=['-trending', 'movie'],
+                         name='score_trending_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.movie_id) + " | " + str(self.bayesian)
+
+
+class MovieNeighbor(models.Model):
+    movie = models.ForeignKey(Movies, on_delete=models.CASCADE,
+                              related_name='neighbors')
+    neighbor = models.ForeignKey(Movies, on_delete=models.CASCADE,
+                                 related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'neighbor'],
+                                    name='unique_movie_neighbor'),
+        ]
+        indexes = [
+            models.Index(fields=['movie', '-score', 'neighbor'],
+                         name='neighbor_movie_score_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.movie_id) + " | " + str(self.neighbor_id)
+
+
+class RemovedReview(models.Model):
+    # Movies that lost a review since the last similarity refresh; a
+    # deleted row leaves no update timestamp to find it by. A plain id, as
+    # the movie may be gone too.
+    movie = models.BigIntegerField(primary_key=True)
+
+    def __str__(self):
+        return str(self.movie)
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'),
+                      (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    # Hash of name and args; at most one identical task waits and one runs
+    # at a time.
+    key = models.CharField(max_length=40)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    started = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'],
+                                    condition=models.Q(status='pending'),
+                                    name='unique_pending_task'),
+            models.UniqueConstraint(fields=['key'],
+                                    condition=models.Q(status='running'),
+                                    name='unique_running_task'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'],
+                         name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return self.name + " | " + self.status
@@ -0,0 +1,99 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, router, transaction
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.models import PlatformStats
+from moviesinfo.ratings import refresh_platform_stats
+
+
+def dependents(model):
+    """
+    Reverse foreign keys and one-to-ones pointing at ``model``, as
+    (related model, field name, on_delete). Hidden relations such as
+    MovieNeighbor.neighbor count too, as they do for QuerySet.delete().
+    """
+    return [(rel.related_model, rel.field.name, rel.on_delete)
+            for rel in model._meta.get_fields(include_hidden=True)
+            if rel.auto_created and not rel.concrete
+            and (rel.one_to_many or rel.one_to_one)]
+
+
+class Purge:
+    """
+    Delete rows and everything that cascades from them with raw DELETE
+    statements, ``batch_size`` rows per transaction. Unlike
+    QuerySet.delete(), nothing is loaded into memory and no signals are
+    sent, and the write lock is released between batches so other writers
+    get in. ``deleted`` counts rows per model.
+    """
+
+    def __init__(self, batch_size=None, pause=None, progress=None):
+        self.batch_size = batch_size or getattr(settings,
+                                                'PURGE_BATCH_SIZE', 1000)
+        self.pause = pause if pause is not None else getattr(
+            settings, 'PURGE_PAUSE', 0)
+        self.progress = progress
+        self.deleted = Counter()
+
+    def delete(self, queryset):
+        model = queryset.model
+        queryset = queryset.order_by('pk').values_list('pk', flat=True)
+        while True:
+            ids = list(queryset[:self.batch_size])
+            if not ids:
+                return
+            # Dependents are drained in their own batches first; the final
+            # transaction only picks up rows added in the meantime.
+            self.delete_dependents(model, ids)
+            with transaction.atomic(using=router.db_for_write(model)):
+                self.delete_dependents(model, ids)
+                self.delete_rows(model, ids)
+            if self.pause:
+                time.sleep(self.pause)
+
+    def delete_dependents(self, model, ids):
+        for related, field, on_delete in dependents(model):
+            children = related._base_manager.filter(**{field + '__in': ids})
+            if on_delete is models.CASCADE:
+                self.delete(children)
+            elif on_delete is models.SET_NULL:
+                children.update(**{field: None})
+            elif on_delete is not models.DO_NOTHING:
+                raise ValueError('%s.%s uses %s, which purge does not '
+                                 'handle.' % (related._meta.label, field,
+                                              on_delete.__name__))
+
+    def delete_rows(self, model, ids):
+        queryset = model._base_manager.filter(pk__in=ids)
+        count = queryset._raw_delete(queryset.db)
+        if count:
+            self.deleted[model] += count
+            if self.progress:
+                self.progress(model, self.deleted[model])
+
+    def finish(self):
+        # Stand-in for the post_delete receivers that were skipped.
+        for model in self.deleted:
+            bump_version(model)
+        return {model._meta.label: count
+                for model, count in self.deleted.items()}
+
+
+def purge_platforms(queryset, **kwargs):
+    purge = Purge(**kwargs)
+    purge.delete(queryset)
+    return purge.finish()
+
+
+def purge_movies(queryset, **kwargs):
+    platform_ids = set(queryset.order_by().values_list(
+        'platform_id', flat=True).distinct())
+    purge = Purge(**kwargs)
+    purge.delete(queryset)
+    # What the Movies post_delete receiver would have done.
+    refresh_platform_stats(platform_ids)
+    bump_version(PlatformStats)
+    return purge.finish()
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from moviesinfo.models import Task
+
+
+REGISTRY = {}
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(name=None, max_attempts=3):
+    """
+    Register a function as a task. Tasks are looked up by name when they
+    run, so their module has to be imported by the worker; the app's
+    ready() imports moviesinfo.tasks.
+    """
+    def decorator(func):
+        func.task_name = name or '%s.%s' % (func.__module__, func.__name__)
+        func.max_attempts = max_attempts
+        REGISTRY[func.task_name] = func
+        return func
+    return decorator
+
+
+def task_key(name, args):
+    return hashlib.sha1(json.dumps(
+        [name, args], sort_keys=True, separators=(',', ':')).encode()
+    ).hexdigest()
+
+
+def enqueue(func, *args, delay=0):
+    enqueue_many([(func, args, delay)])
+
+
+def enqueue_many(calls):
+    """
+    Queue ``(func, args, delay)`` calls in one INSERT. A call identical to
+    one still pending is dropped, so a burst of writes coalesces into a
+    single run. Inside a transaction the tasks only become visible to the
+    workers when it commits.
+    """
+    if setting('TASK_QUEUE_EAGER', False):
+        for func, args, _ in calls:
+            func(*args)
+        return
+
+    now = timezone.now()
+    tasks = {}
+    for func, args, delay in calls:
+        args = list(args)
+        key = task_key(func.task_name, args)
+        tasks.setdefault(key, Task(
+            name=func.task_name, args=args, key=key,
+            max_attempts=func.max_attempts,
+            run_after=now + timedelta(seconds=delay)))
+    Task.objects.bulk_create(tasks.values(), ignore_conflicts=True)
+
+
+def claimable(now):
+    # Running tasks whose lease ran out belong to a worker that died.
+    lease = timedelta(seconds=setting('TASK_QUEUE_LEASE', 300))
+    return Task.objects.filter(
+        Q(status=Task.PENDING, run_after__lte=now) |
+        Q(status=Task.RUNNING, started__lt=now - lease))
+
+
+def claim():
+    """
+    Mark the next due task as running and return it, or None. The status
+    check in the UPDATE makes the claim safe between workers. Only one task
+    per key runs at a time; a pending copy waits until the running one is
+    done, and the unique_running_task constraint settles a tie.
+    """
+    while True:
+        now = timezone.now()
+        tasks = claimable(now)
+        candidate = tasks.exclude(
+            status=Task.PENDING,
+            key__in=Task.objects.filter(status=Task.RUNNING).values('key'),
+        ).order_by('run_after', 'id').values_list('pk', flat=True).first()
+        if candidate is None:
+            return None
+        try:
+            with transaction.atomic():
+                claimed = tasks.filter(pk=candidate).update(
+                    status=Task.RUNNING, started=now,
+                    attempts=F('attempts') + 1)
+        except IntegrityError:
+            # Another worker started the same key in between.
+            continue
+        if claimed:
+            return Task.objects.get(pk=candidate)
+
+
+def run_task(task):
+    func = REGISTRY.get(task.name)
+    if func is None:
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.FAILED, last_error='Unknown task %s' % task.name)
+        return False
+    try:
+        func(*task.args)
+    except Exception:
+        retry_or_fail(task, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task.pk, started=task.started).delete()
+    return True
+
+
+def retry_or_fail(task, error):
+    tasks = Task.objects.filter(pk=task.pk, started=task.started)
+    if task.attempts >= task.max_attempts:
+        tasks.update(status=Task.FAILED, last_error=error)
+        return
+    delay = setting('TASK_QUEUE_RETRY_DELAY', 10) * 2 ** (task.attempts - 1)
+    try:
+        with transaction.atomic():
+            tasks.update(status=Task.PENDING, last_error=error,
+                         run_after=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        # The same task was queued again meanwhile and will do the work.
+        tasks.delete()
+
+
+def work(stop, drain=False):
+    """
+    Run tasks until ``stop`` is set, or until nothing is due with
+    ``drain``. Returns (succeeded, failed).
+    """
+    succeeded = failed = 0
+    poll = setting('TASK_QUEUE_POLL_INTERVAL', 1.0)
+    while not stop.is_set():
+        task = claim()
+        if task is None:
+            if drain:
+                break
+            stop.wait(poll)
+        elif run_task(task):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def run_workers(workers=1, drain=False, stop=None):
+    """
+    Run ``workers`` threads, each with its own database connection. A
+    single worker runs in the calling thread.
+    """
+    stop = stop or threading.Event()
+    if workers == 1:
+        return work(stop, drain)
+
+    results = []
+    lock = threading.Lock()
+
+    def target():
+        try:
+            result = work(stop, drain)
+        finally:
+            connection.close()
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target=target, daemon=True)
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return tuple(sum(column) for column in zip(*results)) or (0, 0)
+
+
+def queue_stats():
+    now = timezone.now()
+    stats = {Task.PENDING: 0, Task.RUNNING: 0, Task.FAILED: 0}
+    stats.update(Task.objects.order_by().values_list('status').annotate(
+        total=Count('pk')))
+    oldest = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=now).aggregate(
+            oldest=Min('run_after'))['oldest']
+    stats['oldest_due_seconds'] = \
+        (now - oldest).total_seconds() if oldest else 0.0
+    return stats
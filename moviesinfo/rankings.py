@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, OuterRef, \
+                    Subquery, Sum, Value, When
+from django.utils import timezone
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.models import ImportCheckpoint, Movies, MovieScore, Review
+
+
+CHECKPOINT = 'rankings:reviews'
+
+# Trending scores are stored as log2 of the summed review weight, measured
+# in half-lives since this fixed epoch. A review's weight never has to be
+# decayed after it is written: a newer review simply starts from a larger
+# exponent, so stored scores stay comparable and can be added to.
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def half_life():
+    return timedelta(days=getattr(settings, 'RANKING_HALF_LIFE_DAYS', 7))
+
+
+def prior():
+    """
+    Return (weight, mean) for the Bayesian average. The mean is the rating
+    across all reviews; the weight is RANKING_PRIOR_WEIGHT or, when unset,
+    the average number of reviews per movie.
+    """
+    totals = Movies.objects.aggregate(
+        movies=Count('pk'), reviews=Sum('number_rating'),
+        rating_sum=Sum('rating_sum'))
+    reviews = totals['reviews'] or 0
+    mean = totals['rating_sum'] / reviews if reviews else 0.0
+    weight = getattr(settings, 'RANKING_PRIOR_WEIGHT', None)
+    if weight is None:
+        weight = reviews / totals['movies'] if totals['movies'] else 0.0
+    return float(weight), mean
+
+
+def bayesian_scores(rating_sums, counts, weight, mean):
+    rating_sums = np.asarray(rating_sums, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.float64)
+    denominator = counts + weight
+    return np.divide(weight * mean + rating_sums, denominator,
+                     out=np.zeros_like(denominator), where=denominator > 0)
+
+
+def trending_scores(movie_ids, ratings, timestamps, period):
+    """
+    Combine reviews into one log2 score per movie. Returns the sorted
+    unique movie ids and their scores.
+    """
+    movie_ids = np.asarray(movie_ids, dtype=np.int64)
+    exponents = (np.asarray(timestamps, dtype=np.float64)
+                 - EPOCH.timestamp()) / period.total_seconds()
+    exponents += np.log2(np.asarray(ratings, dtype=np.float64) / 5)
+
+    # log2-sum-exp2 per movie, shifted by each group's maximum so the
+    # exponents never overflow.
+    movies, groups = np.unique(movie_ids, return_inverse=True)
+    peaks = np.full(len(movies), -np.inf)
+    np.maximum.at(peaks, groups, exponents)
+    totals = np.zeros(len(movies))
+    np.add.at(totals, groups, np.exp2(exponents - peaks[groups]))
+    return movies, peaks + np.log2(totals)
+
+
+def bayesian_expression(weight, mean):
+    """
+    bayesian_scores as SQL over the movie's stored aggregates, for
+    rescoring every movie in one UPDATE.
+    """
+    movie = Movies.objects.filter(pk=OuterRef('movie')).alias(
+        denominator=F('number_rating') + Value(weight))
+    return Subquery(movie.annotate(bayesian=Case(
+        When(denominator__gt=0,
+             then=(Value(weight * mean) + F('rating_sum'))
+             / F('denominator')),
+        default=Value(0.0), output_field=FloatField())).values('bayesian'))
+
+
+def merge_trending(movie_ids, scores, more_ids, more_scores):
+    merged = np.union1d(movie_ids, more_ids)
+    totals = np.full(len(merged), -np.inf)
+    totals[np.searchsorted(merged, movie_ids)] = scores
+    positions = np.searchsorted(merged, more_ids)
+    totals[positions] = np.logaddexp2(totals[positions], more_scores)
+    return merged, totals
+
+
+def review_trending(reviews, period, batch_size):
+    """
+    trending_scores over ``reviews``, read ``batch_size`` rows at a time
+    so only the per-movie totals are held in memory.
+    """
+    movie_ids = np.empty(0, dtype=np.int64)
+    scores = np.empty(0)
+    rows = reviews.values_list('movies_id', 'rating', 'created').iterator(
+        chunk_size=batch_size)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return movie_ids, scores
+        movie_ids, scores = merge_trending(movie_ids, scores, *trending_scores(
+            [movie_id for movie_id, _, _ in batch],
+            [rating for _, rating, _ in batch],
+            [created.timestamp() for _, _, created in batch], period))
+
+
+def refresh_rankings(full=False, now=None):
+    """
+    Recompute MovieScore rows. An incremental run only scores reviews added
+    since the last run and movies that have no score yet; ``full`` rescores
+    every movie from the reviews still inside the trending window, which
+    also drops edited and deleted reviews from the trending totals.
+    Bayesian scores move with the prior, so every run rescores them for
+    all movies. An incremental run that overlaps another one writes
+    nothing and returns 0.
+    """
+    period = half_life()
+    batch_size = getattr(settings, 'RANKING_BATCH_SIZE', 10000)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=CHECKPOINT)
+    last_review = Review.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    reviews = Review.objects.filter(pk__lte=last_review)
+    movies = Movies.objects.all()
+    if full:
+        now = now or timezone.now()
+        window = getattr(settings, 'RANKING_WINDOW_HALF_LIVES', 20)
+        reviews = reviews.filter(created__gte=now - period * window)
+    else:
+        reviews = reviews.filter(pk__gt=checkpoint.position)
+        movies = movies.filter(pk__in=reviews.values('movies')) | \
+            movies.filter(score__isnull=True)
+
+    trending_ids, trending = review_trending(reviews, period, batch_size)
+    weight, mean = prior()
+    rows = list(movies.values_list('pk', 'rating_sum', 'number_rating'))
+    movie_ids = np.array([pk for pk, _, _ in rows], dtype=np.int64)
+    bayesian = bayesian_scores([total for _, total, _ in rows],
+                               [count for _, _, count in rows], weight, mean)
+
+    # Line the trending scores up with the movie rows; movies without
+    # reviews in this run get -inf so logaddexp2 leaves them unchanged.
+    scores = np.full(len(movie_ids), -np.inf)
+    matched = np.isin(movie_ids, trending_ids)
+    scores[matched] = trending[
+        np.searchsorted(trending_ids, movie_ids[matched])]
+    if not full:
+        previous = dict(MovieScore.objects.filter(
+            movie__in=movies, trending__isnull=False).values_list(
+                'movie', 'trending'))
+        scores = np.logaddexp2(scores, np.array(
+            [previous.get(pk, -np.inf) for pk in movie_ids.tolist()]))
+
+    with transaction.atomic():
+        # Advance the checkpoint only from where this run started. If an
+        # overlapping run got there first, the scores read above are stale
+        # and adding this run's reviews again would count them twice.
+        # A full run stands on its own and always wins.
+        checkpoints = ImportCheckpoint.objects.filter(pk=checkpoint.pk)
+        if not full:
+            checkpoints = checkpoints.filter(position=checkpoint.position,
+                                             updated=checkpoint.updated)
+        if not checkpoints.update(position=last_review,
+                                  updated=timezone.now()):
+            return 0
+        MovieScore.objects.bulk_create(
+            [MovieScore(movie_id=pk, bayesian=score,
+                        trending=trend if np.isfinite(trend) else None)
+             for pk, score, trend in zip(movie_ids.tolist(), bayesian.tolist(),
+                                         scores.tolist())],
+            batch_size=1000, update_conflicts=True, unique_fields=['movie'],
+            update_fields=['bayesian', 'trending'])
+        if not full:
+            # Movies without new reviews were scored against an older
+            # prior.
+            MovieScore.objects.update(
+                bayesian=bayesian_expression(weight, mean))
+    bump_version(MovieScore)
+    return len(movie_ids)
@@ -0,0 +1,126 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, \
+                    Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from moviesinfo.models import Movies, Platform, PlatformStats, Review
+
+
+STARS = range(1, 6)
+
+
+def histogram_field(star):
+    return 'rating_%d' % star
+
+
+def average_rating(rating_sum, number_rating):
+    return Coalesce(
+        Cast(rating_sum, FloatField()) / NullIf(number_rating, Value(0)),
+        Value(0.0))
+
+
+def update_rating_aggregates(movie_id, added=(), removed=()):
+    # Applied as a single UPDATE so concurrent reviews never lose a write;
+    # the average is derived from the pre-update row in the same statement.
+    added, removed = list(added), list(removed)
+    sum_delta = sum(added) - sum(removed)
+    count_delta = len(added) - len(removed)
+    stars = Counter(added)
+    stars.subtract(removed)
+    histogram = {histogram_field(star): F(histogram_field(star)) + delta
+                 for star, delta in stars.items() if delta}
+    if not histogram:
+        return
+
+    Movies.objects.filter(pk=movie_id).update(
+        rating_sum=F('rating_sum') + sum_delta,
+        number_rating=F('number_rating') + count_delta,
+        avg_rating=average_rating(F('rating_sum') + sum_delta,
+                                  F('number_rating') + count_delta),
+        **histogram)
+
+
+def update_platform_stats(platform_id, movies=0, active=0):
+    # Review totals are recounted by the queued
+    # moviesinfo.tasks.recount_platform_stats instead.
+    PlatformStats.objects.filter(platform_id=platform_id).update(
+        movie_count=F('movie_count') + movies,
+        active_count=F('active_count') + active)
+
+
+def refresh_platform_stats(platform_ids=None):
+    # Recomputed from the movie aggregates, not the reviews. Only existing
+    # rows are updated, so this is safe while a platform is being deleted.
+    stats = PlatformStats.objects.all()
+    if platform_ids is not None:
+        stats = stats.filter(platform_id__in=platform_ids)
+    movies = Movies.objects.filter(
+        platform=OuterRef('platform')).order_by().values('platform')
+
+    with transaction.atomic():
+        updated = stats.update(
+            name=Subquery(Platform.objects.filter(
+                pk=OuterRef('platform')).values('name')),
+            movie_count=Coalesce(Subquery(
+                movies.annotate(total=Count('pk')).values('total')), 0),
+            active_count=Coalesce(Subquery(
+                movies.filter(active=True).annotate(
+                    total=Count('pk')).values('total')), 0),
+            review_count=Coalesce(Subquery(
+                movies.annotate(total=Sum('number_rating')).values('total')),
+                0),
+            rating_sum=Coalesce(Subquery(
+                movies.annotate(total=Sum('rating_sum')).values('total')), 0))
+        stats.update(
+            avg_rating=average_rating(F('rating_sum'), F('review_count')))
+    return updated
+
+
+def rebuild_platform_stats():
+    with transaction.atomic():
+        PlatformStats.objects.bulk_create([
+            PlatformStats(platform_id=pk, name=name) for pk, name in
+            Platform.objects.filter(stats__isnull=True).values_list(
+                'pk', 'name')])
+        return refresh_platform_stats()
+
+
+def rebuild_rating_aggregates(movie_ids=None):
+    reviews = Review.objects.filter(
+        movies=OuterRef('pk')).order_by().values('movies')
+    movies = Movies.objects.all()
+    if movie_ids is not None:
+        movies = movies.filter(pk__in=movie_ids)
+
+    with transaction.atomic():
+        updated = movies.update(
+            rating_sum=Coalesce(Subquery(
+                reviews.annotate(total=Sum('rating')).values('total')), 0),
+            number_rating=Coalesce(Subquery(
+                reviews.annotate(total=Count('pk')).values('total')), 0),
+            **{histogram_field(star): Coalesce(Subquery(
+                reviews.filter(rating=star).annotate(
+                    total=Count('pk')).values('total')), 0)
+               for star in STARS})
+        movies.update(
+            avg_rating=average_rating(F('rating_sum'), F('number_rating')))
+
+    return updated
+
+
+def verify_rating_aggregates():
+    """
+    Return the ids of movies whose stored counters disagree with their
+    reviews, without changing anything.
+    """
+    raw = {'raw_sum': Coalesce(Sum('reviews__rating'), 0),
+           'raw_count': Count('reviews')}
+    stored = {'rating_sum': F('raw_sum'), 'number_rating': F('raw_count')}
+    for star in STARS:
+        raw['raw_%d' % star] = Count('reviews',
+                                     filter=Q(reviews__rating=star))
+        stored[histogram_field(star)] = F('raw_%d' % star)
+    return list(Movies.objects.annotate(**raw).exclude(**stored).order_by(
+        'pk').values_list('pk', flat=True))
@@ -0,0 +1,93 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+
+SEARCH_TABLE = 'moviesinfo_movies_fts'
+MAX_TERMS = 10
+
+# External-content FTS5 index over Movies, kept in sync by triggers so that
+# bulk inserts and raw SQL writes are indexed too. Rebuilding the index is
+# needed whenever a migration remakes the movies table, since SQLite drops
+# its triggers along with it.
+CREATE_SEARCH_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS moviesinfo_movies_fts USING fts5(
+        title, storyline, content='moviesinfo_movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS moviesinfo_movies_fts_insert
+    AFTER INSERT ON moviesinfo_movies BEGIN
+        INSERT INTO moviesinfo_movies_fts(rowid, title, storyline)
+        VALUES (new.id, new.title, new.storyline);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS moviesinfo_movies_fts_delete
+    AFTER DELETE ON moviesinfo_movies BEGIN
+        INSERT INTO moviesinfo_movies_fts(
+            moviesinfo_movies_fts, rowid, title, storyline)
+        VALUES ('delete', old.id, old.title, old.storyline);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS moviesinfo_movies_fts_update
+    AFTER UPDATE OF title, storyline ON moviesinfo_movies BEGIN
+        INSERT INTO moviesinfo_movies_fts(
+            moviesinfo_movies_fts, rowid, title, storyline)
+        VALUES ('delete', old.id, old.title, old.storyline);
+        INSERT INTO moviesinfo_movies_fts(rowid, title, storyline)
+        VALUES (new.id, new.title, new.storyline);
+    END
+    """,
+    "INSERT INTO moviesinfo_movies_fts(moviesinfo_movies_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_SQL = [
+    'DROP TRIGGER IF EXISTS moviesinfo_movies_fts_insert',
+    'DROP TRIGGER IF EXISTS moviesinfo_movies_fts_delete',
+    'DROP TRIGGER IF EXISTS moviesinfo_movies_fts_update',
+    'DROP TABLE IF EXISTS moviesinfo_movies_fts',
+]
+
+
+def create_search_index(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SEARCH_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SEARCH_SQL:
+            schema_editor.execute(sql)
+
+
+def match_expression(query):
+    # Every term is quoted so user input cannot inject FTS5 syntax, and
+    # starred so "inter" finds "Interstellar".
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def search_movies(queryset, query):
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+
+    if connection.vendor != 'sqlite':
+        terms = Q()
+        for term in re.findall(r'\w+', query)[:MAX_TERMS]:
+            terms &= Q(title__icontains=term) | Q(storyline__icontains=term)
+        return queryset.filter(terms).order_by('title', 'id')
+
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=['%s.rowid = moviesinfo_movies.id' % SEARCH_TABLE,
+               '%s MATCH %%s' % SEARCH_TABLE],
+        params=[expression],
+        # Title hits outrank storyline hits.
+        select={'rank': 'bm25(%s, 10.0, 1.0)' % SEARCH_TABLE},
+        order_by=['rank', 'id'])
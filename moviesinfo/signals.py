@@ -0,0 +1,66 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.models import Movies, Platform, PlatformStats, \
+                        RemovedReview, Review
+from moviesinfo.ratings import rebuild_rating_aggregates, \
+                    refresh_platform_stats, update_platform_stats
+from moviesinfo.tasks import review_changed
+
+
+@receiver([post_save, post_delete], sender=Platform)
+@receiver([post_save, post_delete], sender=Movies)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_cached_responses(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(post_save, sender=Platform)
+def save_platform_stats(sender, instance, created, **kwargs):
+    if created:
+        PlatformStats.objects.create(platform=instance, name=instance.name)
+    else:
+        PlatformStats.objects.filter(platform=instance).update(
+            name=instance.name)
+
+
+@receiver(pre_save, sender=Movies)
+def remember_movie_platform(sender, instance, **kwargs):
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = Movies.objects.filter(pk=instance.pk).values_list(
+            'platform_id', 'active').first()
+
+
+@receiver(post_save, sender=Movies)
+def save_movie_stats(sender, instance, created, **kwargs):
+    if created:
+        update_platform_stats(instance.platform_id, movies=1,
+                              active=int(instance.active))
+    elif instance._previous != (instance.platform_id, instance.active):
+        # The movie's reviews move with it, so recount both platforms.
+        platform_ids = {instance.platform_id}
+        if instance._previous:
+            platform_ids.add(instance._previous[0])
+        refresh_platform_stats(platform_ids)
+
+
+@receiver(post_delete, sender=Movies)
+def delete_movie_stats(sender, instance, **kwargs):
+    refresh_platform_stats([instance.platform_id])
+
+
+@receiver(post_delete, sender=Review)
+def delete_review_aggregates(sender, instance, origin=None, **kwargs):
+    # Covers every delete path: the API, the admin and cascades from a
+    # deleted user. Recounting rather than decrementing keeps a repeated
+    # delete of the same review harmless. Reviews going away with their
+    # movie or platform need no recount.
+    if getattr(origin, 'model', type(origin)) in (Movies, Platform):
+        return
+    rebuild_rating_aggregates([instance.movies_id])
+    # Similar-movie refreshes cannot see a row that is gone.
+    RemovedReview.objects.bulk_create(
+        [RemovedReview(movie=instance.movies_id)], ignore_conflicts=True)
+    review_changed(instance.movies.platform_id)
@@ -0,0 +1,218 @@
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+
+from moviesinfo.api.cache import bump_version
+from moviesinfo.models import ImportCheckpoint, MovieNeighbor, \
+                        RemovedReview, Review
+
+
+CHECKPOINT = 'similarity:reviews'
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def review_matrix(chunk_size=100000):
+    """
+    Load the active reviews as a users x movies CSC matrix of float32
+    ratings. Returns the matrix and the movie id of each column.
+    """
+    users, movies, ratings = [], [], []
+    reviews = Review.objects.filter(active=True).order_by().values_list(
+        'review_user_id', 'movies_id', 'rating').iterator(
+            chunk_size=chunk_size)
+    while True:
+        chunk = np.array(
+            [row for _, row in zip(range(chunk_size), reviews)],
+            dtype=np.int64).reshape(-1, 3)
+        if not len(chunk):
+            break
+        users.append(chunk[:, 0].astype(np.int32))
+        movies.append(chunk[:, 1])
+        ratings.append(chunk[:, 2].astype(np.float32))
+
+    if not users:
+        return sparse.csc_matrix((0, 0), dtype=np.float32), \
+            np.zeros(0, dtype=np.int64)
+    _, user_index = np.unique(np.concatenate(users), return_inverse=True)
+    movie_ids, movie_index = np.unique(np.concatenate(movies),
+                                       return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.concatenate(ratings), (user_index, movie_index)),
+        shape=(user_index.max() + 1, len(movie_ids)))
+    return matrix, movie_ids
+
+
+def normalize_columns(matrix):
+    # Plain cosine: a column is scaled by its own norm only, so a changed
+    # review moves the similarities of that one movie and nothing else.
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1
+    return (matrix @ sparse.diags(1 / norms).astype(np.float32)).tocsc()
+
+
+def top_k(rows, cols, scores, k):
+    """
+    Keep the k highest scores per row, ties broken by the lower column.
+    """
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    return rows[keep], cols[keep], scores[keep]
+
+
+def similarities(normalized, columns):
+    """
+    Cosine similarity of ``columns`` against every movie as (row, col,
+    score) arrays, without self-pairs or non-positive scores.
+    """
+    block = (normalized[:, columns].T @ normalized).tocoo()
+    rows, cols = columns[block.row], block.col
+    keep = (rows != cols) & (block.data > 1e-6)
+    return rows[keep], cols[keep], block.data[keep].astype(np.float64)
+
+
+def delete_neighbors(movies):
+    batch = setting('SIMILARITY_BATCH_SIZE', 1000)
+    movies = list(movies)
+    for start in range(0, len(movies), batch):
+        MovieNeighbor.objects.filter(
+            movie__in=movies[start:start + batch]).delete()
+
+
+def insert_neighbors(movie_ids, rows, cols, scores):
+    MovieNeighbor.objects.bulk_create(
+        [MovieNeighbor(movie_id=movie, neighbor_id=neighbor, score=score)
+         for movie, neighbor, score in zip(movie_ids[rows].tolist(),
+                                           movie_ids[cols].tolist(),
+                                           scores.tolist())],
+        batch_size=setting('SIMILARITY_BATCH_SIZE', 1000))
+
+
+def rebuild_neighbors(normalized, movie_ids, columns, k, block_size,
+                      collect=False):
+    """
+    Replace the neighbour lists of ``columns``, ``block_size`` movies at a
+    time so only one block of the product is held in memory. Each block is
+    its own transaction, so the write lock is released between blocks and
+    readers only ever see whole lists. With ``collect`` the scores other
+    movies need from ``columns`` are returned as well: the k best per other
+    movie, which is all merge_neighbors can keep.
+    """
+    found = tuple(np.zeros(0, dtype=dtype)
+                  for dtype in (np.int64, np.int64, np.float64))
+    for start in range(0, len(columns), block_size):
+        block_columns = columns[start:start + block_size]
+        rows, cols, scores = similarities(normalized, block_columns)
+        with transaction.atomic():
+            delete_neighbors(movie_ids[block_columns].tolist())
+            insert_neighbors(movie_ids, *top_k(rows, cols, scores, k))
+        if collect:
+            others = ~np.isin(cols, columns)
+            # Truncated in the transposed order so that ties fall the same
+            # way as in merge_neighbors.
+            cols, rows, scores = top_k(
+                np.concatenate((found[1], cols[others])),
+                np.concatenate((found[0], rows[others])),
+                np.concatenate((found[2], scores[others])), k)
+            found = rows, cols, scores
+    return found
+
+
+def merge_neighbors(movie_ids, recompute, rows, cols, scores, k):
+    """
+    Fold the new scores of the recomputed movies into the lists of the
+    movies they are similar to. Similarity is symmetric, so those scores
+    are the transposed rows; pairs between two other movies are unchanged
+    and come from the stored lists.
+    """
+    others = ~np.isin(cols, recompute)
+    rows, cols, scores = cols[others], rows[others], scores[others]
+    targets = np.unique(rows)
+    if not len(targets):
+        return
+
+    index = dict(zip(movie_ids.tolist(), range(len(movie_ids))))
+    recomputed = set(movie_ids[recompute].tolist())
+    batch = setting('SIMILARITY_BATCH_SIZE', 1000)
+    stored = []
+    for start in range(0, len(targets), batch):
+        stored.extend(
+            (index[movie], index[neighbor], score)
+            for movie, neighbor, score in MovieNeighbor.objects.filter(
+                movie__in=movie_ids[targets[start:start + batch]].tolist(),
+            ).values_list('movie_id', 'neighbor_id', 'score')
+            if neighbor not in recomputed and neighbor in index)
+    if stored:
+        stored = np.array(stored).T
+        rows = np.concatenate((rows, stored[0].astype(np.int64)))
+        cols = np.concatenate((cols, stored[1].astype(np.int64)))
+        scores = np.concatenate((scores, stored[2]))
+
+    delete_neighbors(movie_ids[targets].tolist())
+    insert_neighbors(movie_ids, *top_k(rows, cols, scores, k))
+
+
+def refresh_similar(full=False):
+    """
+    Rebuild the top-k neighbour lists. An incremental run only recomputes
+    movies whose reviews were added or edited since the last run, plus the
+    movies whose stored list mentioned one of them, and merges the new
+    scores into everyone else's list. Deleted reviews are found through
+    the RemovedReview rows their delete left behind. ``full`` recomputes
+    every movie.
+    """
+    k = setting('SIMILARITY_NEIGHBORS', 20)
+    block_size = setting('SIMILARITY_BLOCK_SIZE', 1024)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=CHECKPOINT)
+    latest = Review.objects.aggregate(latest=Max('update'))['latest']
+    # Read before the matrix, so a delete that lands during the run is
+    # picked up by the next one.
+    removed = set(RemovedReview.objects.values_list('movie', flat=True))
+    full = full or not checkpoint.position
+
+    matrix, movie_ids = review_matrix()
+    normalized = normalize_columns(matrix)
+    if full:
+        columns = np.arange(len(movie_ids))
+        rebuild_neighbors(normalized, movie_ids, columns, k, block_size)
+        # Movies that lost all their reviews keep no list.
+        stale = set(MovieNeighbor.objects.values_list(
+            'movie_id', flat=True).distinct()) - set(movie_ids.tolist())
+        delete_neighbors(stale)
+        changed = len(movie_ids)
+    else:
+        since = datetime.fromtimestamp(checkpoint.position / 1e6,
+                                       tz=dt_timezone.utc)
+        dirty = removed | set(Review.objects.filter(
+            update__gte=since).values_list('movies_id', flat=True))
+        affected = dirty | set(MovieNeighbor.objects.filter(
+            Q(neighbor__in=Review.objects.filter(update__gte=since).values(
+                'movies')) | Q(neighbor__in=removed)).values_list(
+                    'movie_id', flat=True))
+        recompute = np.flatnonzero(np.isin(movie_ids, list(affected)))
+        with transaction.atomic():
+            delete_neighbors(affected)
+            rows, cols, scores = rebuild_neighbors(
+                normalized, movie_ids, recompute, k, block_size, collect=True)
+            merge_neighbors(movie_ids, recompute, rows, cols, scores, k)
+        changed = len(affected)
+
+    removed = list(removed)
+    batch = setting('SIMILARITY_BATCH_SIZE', 1000)
+    for start in range(0, len(removed), batch):
+        RemovedReview.objects.filter(
+            movie__in=removed[start:start + batch]).delete()
+    if latest is not None:
+        checkpoint.position = int(latest.timestamp() * 1e6)
+        checkpoint.save()
+    bump_version(MovieNeighbor)
+    return changed
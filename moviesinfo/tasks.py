@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from moviesinfo.api.cache import bump_version, is_shared
+from moviesinfo.models import PlatformStats
+from moviesinfo.queue import enqueue_many, task
+from moviesinfo.rankings import refresh_rankings
+from moviesinfo.ratings import refresh_platform_stats
+from moviesinfo.similarity import refresh_similar
+
+
+@task()
+def recount_platform_stats(platform_id):
+    # Recounted rather than incremented, so a retry or a coalesced burst of
+    # reviews still ends at the right totals.
+    refresh_platform_stats([platform_id])
+    bump_version(PlatformStats)
+
+
+@task()
+def update_rankings():
+    refresh_rankings()
+
+
+@task()
+def update_similar():
+    refresh_similar()
+
+
+def warm_host():
+    host = getattr(settings, 'CACHE_WARM_HOST', None)
+    if host:
+        return host
+    # Otherwise the first exact name the site answers to.
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def warm_response(path):
+    """
+    Render ``path`` as an anonymous GET so its cache_response entry is
+    filled before a visitor asks for it. Throttles are skipped; the warmer
+    is not a client. The request comes in on warm_host(), since host and
+    scheme are part of the cache key and of any links in the response.
+    """
+    match = resolve(path)
+    view = match.func
+    initkwargs = dict(view.initkwargs, throttle_classes=[])
+    if getattr(view, 'actions', None):
+        view = view.cls.as_view(view.actions, **initkwargs)
+    else:
+        view = view.cls.as_view(**initkwargs)
+    request = RequestFactory().get(
+        path, HTTP_HOST=warm_host(),
+        secure=getattr(settings, 'CACHE_WARM_SECURE', False))
+    response = view(request, *match.args, **match.kwargs)
+    return response.status_code
+
+
+@task()
+def warm_cache():
+    for name in getattr(settings, 'CACHE_WARM_URLS', []):
+        warm_response(reverse(name))
+
+
+def review_changed(*platform_ids):
+    """
+    Queue the follow-up work of a review write on movies of
+    ``platform_ids``. The delays batch a burst of reviews into one refresh
+    of each kind.
+    """
+    calls = [(recount_platform_stats, (platform_id,), 0)
+             for platform_id in sorted(platform_ids)] + [
+        (update_rankings, (),
+         getattr(settings, 'RANKING_REFRESH_DELAY', 60)),
+        (update_similar, (),
+         getattr(settings, 'SIMILARITY_REFRESH_DELAY', 3600)),
+    ]
+    # A per-process response cache would be warmed for the worker alone.
+    if is_shared():
+        calls.append((warm_cache, (),
+                      getattr(settings, 'CACHE_WARM_DELAY', 90)))
+    enqueue_many(calls)
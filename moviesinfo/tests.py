@@ -1,12 +1,50 @@
+import asyncio
+import base64
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
+import numpy as np
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIRequestFactory
 from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
+from imdbclone.database import sqlite_databases
+from imdbclone.metrics import registry
+from imdbclone.routers import PrimaryReplicaRouter, ThrottleRouter
 from moviesinfo.api import serializers
-from moviesinfo import models
+from moviesinfo.api.cache import stats as cache_stats
+from moviesinfo.api.async_views import MoviesAsyncAV
+from moviesinfo.api.compiled import NotCompilable, compile_serializer
+from moviesinfo.dataset import generate
+from moviesinfo.rankings import EPOCH, refresh_rankings
+from moviesinfo.ratings import rebuild_rating_aggregates, \
+                    update_rating_aggregates
+from moviesinfo.similarity import normalize_columns, rebuild_neighbors, \
+                    refresh_similar, review_matrix, similarities
+from moviesinfo.queue import claim, enqueue, run_workers, task
+from moviesinfo.tasks import warm_cache
+from moviesinfo.api.throttling import ReviewCreateThrottle
+from moviesinfo import models, rankings
 
 
 class PlatformTestCase(APITestCase):
@@ -75,6 +113,7 @@ class MoviesTestCase(APITestCase):
 class ReviewTestCase(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username="example", password="Password@123")
         self.token = Token.objects.get(user__username=self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
@@ -140,6 +179,1659 @@ class ReviewTestCase(APITestCase):
         response = self.client.delete(reverse('review-detail', args=(self.review.id,)))
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_review_rating_aggregates(self):
+        data = {"rating": 5, "description": "Great Movie!", "active": True}
+        self.client.post(reverse('review-create', args=(self.movies.id,)), data)
+
+        other = User.objects.create_user(username="other", password="Password@123")
+        self.client.force_authenticate(user=other)
+        data = {"rating": 2, "description": "Not for me", "active": True}
+        self.client.post(reverse('review-create', args=(self.movies.id,)), data)
+
+        self.movies.refresh_from_db()
+        self.assertEqual(self.movies.number_rating, 2)
+        self.assertEqual(self.movies.rating_sum, 7)
+        self.assertEqual(self.movies.avg_rating, 3.5)
+
+        review = models.Review.objects.get(movies=self.movies, review_user=other)
+        data = {"rating": 4, "description": "Grew on me", "active": True}
+        self.client.put(reverse('review-detail', args=(review.id,)), data)
+        self.movies.refresh_from_db()
+        self.assertEqual(self.movies.avg_rating, 4.5)
+
+        self.client.delete(reverse('review-detail', args=(review.id,)))
+        self.movies.refresh_from_db()
+        self.assertEqual(self.movies.number_rating, 1)
+        self.assertEqual(self.movies.avg_rating, 5)
+
+    def test_deleted_user_reviews_leave_aggregates(self):
+        other = User.objects.create_user(username="other",
+                                         password="Password@123")
+        self.client.force_authenticate(user=other)
+        for movie in (self.movies, self.movies2):
+            self.client.post(reverse('review-create', args=(movie.id,)),
+                             {"rating": 2, "description": "Meh"})
+
+        other.delete()
+        self.movies.refresh_from_db()
+        self.assertEqual((self.movies.number_rating, self.movies.rating_sum,
+                          self.movies.rating_2), (0, 0, 0))
+        self.movies2.refresh_from_db()
+        self.assertEqual((self.movies2.number_rating, self.movies2.avg_rating),
+                         (1, 5))
+        call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+        call_command('run_tasks', '--once', stdout=StringIO())
+        stats = models.PlatformStats.objects.get(platform=self.stream)
+        self.assertEqual((stats.review_count, stats.rating_sum), (1, 5))
+
+    def test_rebuild_ratings(self):
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.movies2.refresh_from_db()
+        self.assertEqual(self.movies2.number_rating, 1)
+        self.assertEqual(self.movies2.rating_sum, 5)
+        self.assertEqual(self.movies2.avg_rating, 5)
+
+    def test_duplicate_review_constraint(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Review.objects.create(review_user=self.user, rating=1,
+                                movies=self.movies2, active=True)
+
+    def test_index_benchmark(self):
+        out = StringIO()
+        call_command('index_benchmark', '--runs', '1', '--json', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {'before', 'after'})
+        self.assertTrue(any('unique_review_per_user' in step or 'autoindex' in step
+                            for step in results['after']['duplicate-review']['plan']))
+        self.assertTrue(models.Review.objects.filter(movies=self.movies2).exists())
+
     def test_review_user(self):
         response = self.client.get('/home/reviews/?username' + self.user.username)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class QueryCountTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example", password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        reviewers = [User.objects.create_user(username="reviewer%d" % i, password="Password@123")
+                     for i in range(3)]
+        for i in range(3):
+            stream = models.Platform.objects.create(name="Platform %d" % i,
+                                about="Platform", website="https://www.example.com")
+            for j in range(4):
+                movie = models.Movies.objects.create(platform=stream, title="Movie %d-%d" % (i, j),
+                                storyline="Example Movie", active=True)
+                for reviewer in reviewers:
+                    models.Review.objects.create(review_user=reviewer, rating=4,
+                                description="Good", movies=movie, active=True)
+        self.stream = stream
+        self.movie = movie
+
+    # One query authenticates the token; the rest must not grow with the catalog.
+    def test_platform_list_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('platform-list'))
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]['movies'][0]['platform'], 'Platform 0')
+
+    def test_platform_ind_queries(self):
+        # Plus the row lookup behind the ETag.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('platform-detail', args=(self.stream.id,)))
+        self.assertEqual(len(response.data['movies']), 4)
+
+    def test_movies_list_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('movie-list'))
+        self.assertEqual(len(response.data), 12)
+
+    def test_movies_ind_queries(self):
+        with self.assertNumQueries(3):
+            self.client.get(reverse('movie-detail', args=(self.movie.id,)))
+
+    def test_watch_list_queries(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('watch-list'))
+
+    def test_review_list_queries(self):
+        # Plus one upsert for the shared review-list throttle.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('review-list', args=(self.movie.id,)))
+        self.assertEqual(response.data['results'][0]['review_user'], 'reviewer0')
+
+    def test_user_review_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user-review-detail') + '?username=reviewer1')
+        self.assertEqual(len(response.data['results']), 12)
+
+
+class ResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example", password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.stream = models.Platform.objects.create(name="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        self.movies = models.Movies.objects.create(platform=self.stream, title="Example Movie",
+                                storyline="Example Movie", active=True)
+
+    def assert_cached_until_write(self):
+        response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        # Both the token and the response come from cache.
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(response.data), 1)
+
+        models.Movies.objects.create(platform=self.stream, title="Second Movie",
+                                storyline="Example Movie", active=True)
+        response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 2)
+
+    def test_locmem_cache(self):
+        self.assert_cached_until_write()
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'example.com'])
+    def test_host_and_scheme_in_key(self):
+        response = self.client.get(reverse('watch-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.client.get(reverse('watch-list'),
+                                   HTTP_HOST='example.com', secure=True)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.client.get(reverse('watch-list'),
+                                   HTTP_HOST='example.com', secure=True)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                       'LOCATION': location}
+            with self.settings(CACHES={'default': caches.settings['default'],
+                                       'responses': backend},
+                               RESPONSE_CACHE_ALIAS='responses'):
+                self.assert_cached_until_write()
+
+    def test_review_invalidates_platform(self):
+        self.client.get(reverse('platform-detail', args=(self.stream.id,)))
+        models.Review.objects.create(review_user=self.user, rating=3,
+                                movies=self.movies, active=True)
+        response = self.client.get(reverse('platform-detail', args=(self.stream.id,)))
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_query_params_are_part_of_key(self):
+        self.client.get(reverse('review-list', args=(self.movies.id,)))
+        response = self.client.get(reverse('review-list', args=(self.movies.id,)) + '?active=true')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertGreaterEqual(cache_stats.snapshot()['misses'], 2)
+
+
+class ExportTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stream = models.Platform.objects.create(name="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        for i in range(250):
+            models.Movies.objects.create(platform=self.stream, title="Movie %d" % i,
+                                storyline="Example Movie", active=True)
+
+    def test_movies_ndjson(self):
+        response = self.client.get(reverse('movie-list') + '?export=ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = self.client.get(reverse('movie-list')).data
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(expected)))
+
+    def test_movies_json_matches_list(self):
+        response = self.client.get(reverse('movie-list') + '?export=json')
+        exported = b''.join(response.streaming_content)
+        self.assertEqual(exported, self.client.get(reverse('movie-list')).content)
+
+    def test_platforms_json_matches_list(self):
+        response = self.client.get(reverse('platform-list') + '?export=json')
+        exported = b''.join(response.streaming_content)
+        self.assertEqual(exported, self.client.get(reverse('platform-list')).content)
+
+    def test_unknown_export(self):
+        response = self.client.get(reverse('movie-list') + '?export=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MovieSearchTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stream = models.Platform.objects.create(name="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        self.interstellar = models.Movies.objects.create(platform=self.stream, title="Interstellar",
+                                storyline="Astronauts travel through a wormhole", active=True)
+        self.inception = models.Movies.objects.create(platform=self.stream, title="Inception",
+                                storyline="A thief enters dreams, interstellar in scope", active=True)
+        models.Movies.objects.create(platform=self.stream, title="Heat",
+                                storyline="A heist in Los Angeles", active=True)
+
+    def search(self, query):
+        response = self.client.get(reverse('movie-search'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [movie['title'] for movie in response.data['results']]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.search('inter'), ['Interstellar', 'Inception'])
+        self.assertEqual(self.search('worm trav'), ['Interstellar'])
+
+    def test_title_ranks_above_storyline(self):
+        self.assertEqual(self.search('interstellar')[0], 'Interstellar')
+
+    def test_index_follows_writes(self):
+        self.inception.title = "Tenet"
+        self.inception.storyline = "Time inversion"
+        self.inception.save()
+        self.assertEqual(self.search('incep'), [])
+        self.assertEqual(self.search('tenet'), ['Tenet'])
+
+        self.interstellar.delete()
+        self.assertEqual(self.search('inter'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('heat"* ('), ['Heat'])
+        self.assertEqual(self.search('   '), [])
+        response = self.client.get(reverse('movie-search'), {'q': 'heat'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['platform'], 'Netflix')
+
+
+class SharedThrottleTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="example", password="Password@123")
+        self.request = APIRequestFactory().get('/')
+        self.request.user = self.user
+
+    def make_throttle(self, rate, now):
+        throttle = ReviewCreateThrottle()
+        throttle.rate = rate
+        throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+        throttle.timer = lambda: now
+        return throttle
+
+    def test_limit_within_window(self):
+        results = [self.make_throttle('3/min', 1200.0).allow_request(self.request, None)
+                   for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        counter = models.ThrottleCounter.objects.get()
+        self.assertEqual(counter.count, 3)
+
+    def test_previous_window_decays(self):
+        for _ in range(4):
+            self.make_throttle('4/min', 1230.0).allow_request(self.request, None)
+
+        # Six seconds into the next window 90% of the previous count still
+        # applies: 4 * 0.9 = 3.6 leaves room for exactly one request, and
+        # the next one fits once the weight drops below 75%.
+        throttle = self.make_throttle('4/min', 1266.0)
+        self.assertTrue(throttle.allow_request(self.request, None))
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertAlmostEqual(throttle.wait(), 9.0)
+
+        self.assertTrue(self.make_throttle('4/min', 1400.0).allow_request(self.request, None))
+        self.assertEqual(models.ThrottleCounter.objects.count(), 1)
+
+    def test_wait_rolls_stale_row_forward(self):
+        for _ in range(4):
+            self.make_throttle('4/min', 1230.0).allow_request(self.request, None)
+
+        # Refused requests leave the row in the earlier window; its four
+        # requests only weigh in as the previous window, which has to decay
+        # to half before a lowered limit of two lets one through.
+        throttle = self.make_throttle('2/min', 1270.0)
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertEqual(models.ThrottleCounter.objects.get().epoch, 20)
+        self.assertAlmostEqual(throttle.wait(), 20.0)
+
+    def test_purge_expired(self):
+        self.make_throttle('4/min', 1230.0).allow_request(self.request, None)
+        call_command('purge_throttles', stdout=StringIO())
+        self.assertFalse(models.ThrottleCounter.objects.exists())
+
+
+class AsyncReadPathTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example", password="Password@123")
+        self.stream = models.Platform.objects.create(name="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        self.movies = models.Movies.objects.create(platform=self.stream, title="Example Movie",
+                                storyline="Example Movie", active=True)
+        models.Review.objects.create(review_user=self.user, rating=4, description="Good",
+                                movies=self.movies, active=True)
+
+    def assert_same_response(self, sync_url, async_url):
+        cache.clear()
+        expected = self.client.get(sync_url)
+        cache.clear()
+        response = self.client.get(async_url)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+
+    def test_matches_sync_endpoints(self):
+        pairs = [
+            (reverse('movie-list'), reverse('async-movie-list')),
+            (reverse('movie-detail', args=(self.movies.id,)),
+             reverse('async-movie-detail', args=(self.movies.id,))),
+            (reverse('movie-detail', args=(0,)), reverse('async-movie-detail', args=(0,))),
+            (reverse('platform-list'), reverse('async-platform-list')),
+            (reverse('platform-detail', args=(self.stream.id,)),
+             reverse('async-platform-detail', args=(self.stream.id,))),
+            (reverse('platform-detail', args=(0,)), reverse('async-platform-detail', args=(0,))),
+            (reverse('review-list', args=(self.movies.id,)) + '?active=false',
+             reverse('async-review-list', args=(self.movies.id,)) + '?active=false'),
+            (reverse('review-list', args=(self.movies.id,)),
+             reverse('async-review-list', args=(self.movies.id,))),
+        ]
+        for sync_url, async_url in pairs:
+            with self.subTest(url=async_url):
+                self.assert_same_response(sync_url, async_url)
+
+    async def test_export_matches_sync(self):
+        # The json export is byte-identical to the plain list response.
+        expected = await self.async_client.get(reverse('movie-list'))
+        response = await self.async_client.get(reverse('async-movie-list') + '?export=json')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]),
+                         expected.content)
+
+    def test_read_only(self):
+        self.user.is_staff = True
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('async-movie-list'), {})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse('async-movie-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['title'], 'Example Movie')
+
+
+class ReviewBatchTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="partner", password="Password@123")
+        self.client.force_authenticate(user=self.user)
+        self.reviewer = User.objects.create_user(username="reviewer", password="Password@123")
+
+        self.stream = models.Platform.objects.create(name="Netflix",
+                                about="#1 Platform", website="https://www.netflix.com")
+        self.movies = models.Movies.objects.create(platform=self.stream, title="Example Movie",
+                                storyline="Example Movie", active=True)
+        self.movies2 = models.Movies.objects.create(platform=self.stream, title="Example Movie",
+                                storyline="Example Movie", active=True)
+        models.Review.objects.create(review_user=self.user, rating=5, description="Great Movie",
+                                movies=self.movies2, active=True)
+
+    def test_batch_create(self):
+        self.user.is_staff = True
+        self.user.save()
+        data = [
+            {"movies": self.movies.id, "rating": 4, "description": "Good"},
+            {"movies": self.movies.id, "rating": 2, "review_user": "reviewer"},
+            {"movies": self.movies2.id, "rating": 3, "review_user": "reviewer"},
+            {"movies": self.movies2.id, "rating": 3},
+            {"movies": self.movies.id, "rating": 1},
+            {"movies": self.movies.id, "rating": 9},
+            {"movies": 0, "rating": 3},
+            {"movies": self.movies.id, "rating": 3, "review_user": "nobody"},
+        ]
+        # Plus one stats update for the single platform both movies are on.
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse('review-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4, 5, 6, 7])
+
+        self.movies.refresh_from_db()
+        self.assertEqual((self.movies.number_rating, self.movies.avg_rating), (2, 3))
+        self.movies2.refresh_from_db()
+        self.assertEqual((self.movies2.number_rating, self.movies2.rating_sum), (1, 3))
+
+    def test_only_staff_posts_for_others(self):
+        data = [{"movies": self.movies.id, "rating": 4, "review_user": "reviewer"}]
+        response = self.client.post(reverse('review-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.Review.objects.filter(movies=self.movies).exists())
+
+    def test_rejects_non_list(self):
+        response = self.client.post(reverse('review-batch'), {"movies": 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_movie(self):
+        data = [{"movies": 10 ** 30, "rating": 3},
+                {"movies": self.movies.id, "rating": 4}]
+        response = self.client.post(reverse('review-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+        self.assertIn('movies', response.data['errors'][0]['errors'])
+
+
+class ImportCatalogTestCase(APITestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        models.Platform.objects.create(name="Netflix", about="Old", website="https://www.netflix.com")
+
+        self.platforms = os.path.join(self.directory.name, 'platforms.csv')
+        with open(self.platforms, 'w', newline='') as handle:
+            handle.write("name,about,website\n"
+                         "Netflix,#1 Platform,https://www.netflix.com\n"
+                         "Prime,Streaming,https://www.primevideo.com\n"
+                         "Broken,No website,not-a-url\n")
+
+        self.movies = os.path.join(self.directory.name, 'movies.ndjson')
+        with open(self.movies, 'w') as handle:
+            for i in range(7):
+                handle.write(json.dumps({"platform": "Prime" if i % 2 else "Netflix",
+                                         "title": "Movie %d" % i, "storyline": "Story",
+                                         "active": True}) + "\n")
+            handle.write(json.dumps({"platform": "Unknown", "title": "Lost",
+                                     "storyline": "Story"}) + "\n")
+            handle.write(json.dumps({"platform": "Prime", "storyline": "No title"}) + "\n")
+
+    def run_import(self, *args):
+        call_command('import_catalog', '--platforms', self.platforms, '--movies', self.movies,
+                     '--batch-size', '3', *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_import(self):
+        self.run_import()
+        self.assertEqual(models.Platform.objects.count(), 2)
+        self.assertEqual(dict(models.PlatformStats.objects.values_list(
+            'name', 'movie_count')), {'Netflix': 4, 'Prime': 3})
+        self.assertEqual(models.Platform.objects.get(name="Netflix").about, "#1 Platform")
+        self.assertEqual(models.Movies.objects.filter(platform__name="Prime").count(), 3)
+        self.assertEqual(models.Movies.objects.count(), 7)
+
+        # Checkpoints make a second run a no-op.
+        self.run_import()
+        self.assertEqual(models.Movies.objects.count(), 7)
+
+    def test_resume(self):
+        models.ImportCheckpoint.objects.create(
+            source='movies:' + os.path.abspath(self.movies), position=3)
+        self.run_import()
+        self.assertEqual(list(models.Movies.objects.values_list('title', flat=True)),
+                         ['Movie 3', 'Movie 4', 'Movie 5', 'Movie 6'])
+
+        # A restart replays every row but updates the movies it finds.
+        models.Movies.objects.filter(title='Movie 4').update(storyline='Old')
+        self.run_import('--restart')
+        self.assertEqual(models.Movies.objects.count(), 7)
+        self.assertEqual(models.Movies.objects.get(title='Movie 4').storyline,
+                         'Story')
+        self.assertEqual(dict(models.PlatformStats.objects.values_list(
+            'name', 'movie_count')), {'Netflix': 4, 'Prime': 3})
+
+    def test_restart_updates_active_counts(self):
+        self.run_import()
+        with open(self.movies, 'a') as handle:
+            handle.write(json.dumps({"platform": "Prime", "title": "Movie 1",
+                                     "storyline": "Story",
+                                     "active": False}) + "\n")
+        self.run_import('--restart')
+        self.assertEqual(models.Movies.objects.count(), 7)
+        stats = models.PlatformStats.objects.get(name='Prime')
+        self.assertEqual((stats.movie_count, stats.active_count), (3, 2))
+
+
+class BenchmarkTestCase(APITestCase):
+
+    def test_routes_within_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_api', '--scale', 'tiny', '--iterations', '2',
+                         '--in-place', '--output', output, stdout=StringIO())
+            with open(output) as handle:
+                results = json.load(handle)
+        self.assertEqual(results['violations'], [])
+        self.assertIn('review-batch', results['routes'])
+        self.assertLessEqual(results['routes']['platform-list']['queries'], 3)
+        # Cold requests miss the response cache; warm ones are served
+        # from it.
+        self.assertGreater(results['routes']['movie-list']['queries'], 0)
+        self.assertEqual(results['routes']['movie-list']['warm_queries'], 0)
+        self.assertIsNone(results['routes']['login']['warm_p50_ms'])
+
+        # The in-place run leaves nothing behind.
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(models.Movies.objects.exists())
+
+
+class GenerateDatasetTestCase(APITestCase):
+
+    def test_generate_dataset(self):
+        call_command('generate_dataset', '--platforms', '2', '--movies', '20',
+                     '--users', '15', '--reviews', '120', '--seed', '7',
+                     '--batch-size', '25', stdout=StringIO())
+        self.assertEqual(models.Movies.objects.count(), 20)
+        self.assertEqual(models.Review.objects.count(), 120)
+        self.assertEqual(Token.objects.count(), User.objects.count())
+        self.assertTrue(User.objects.first().check_password('Password@123'))
+
+        # Popularity is skewed but every aggregate matches its reviews.
+        counts = list(models.Movies.objects.order_by('id').values_list(
+            'number_rating', flat=True))
+        self.assertGreater(counts[0], counts[-1])
+        for movie in models.Movies.objects.all():
+            ratings = list(movie.reviews.values_list('rating', flat=True))
+            self.assertEqual(movie.number_rating, len(ratings))
+            self.assertEqual(movie.rating_sum, sum(ratings))
+
+        response = self.client.get(reverse('movie-search') + '?q=' +
+                                   models.Movies.objects.first().title)
+        self.assertGreater(response.data['count'], 0)
+
+    def test_movies_without_reviews_are_flushed_in_batches(self):
+        reports = []
+        generate(1, 25, 1, 0, batch_size=10, progress=reports.append)
+        self.assertEqual(models.Movies.objects.count(), 25)
+        self.assertIn('10 movies, 0 reviews', reports)
+        self.assertIn('20 movies, 0 reviews', reports)
+
+    def test_generate_dataset_is_deterministic(self):
+        def snapshot():
+            return list(models.Review.objects.order_by('id').values_list(
+                'movies', 'review_user', 'rating', 'created'))
+
+        generate(2, 10, 10, 40, seed=3)
+        first = snapshot()
+        models.Review.objects.all().delete()
+        models.Movies.objects.all().delete()
+        models.Platform.objects.all().delete()
+        User.objects.all().delete()
+        generate(2, 10, 10, 40, seed=3)
+        second = snapshot()
+        self.assertEqual(len(first), 40)
+        # Ids continue after the deleted rows, so compare by offset.
+        offset = [(m - first[0][0], u - first[0][1], r, c)
+                  for m, u, r, c in first]
+        self.assertEqual(offset, [(m - second[0][0], u - second[0][1], r, c)
+                                  for m, u, r, c in second])
+
+    def test_runs_do_not_collide(self):
+        User.objects.create_user(username='user1', password='Password@123',
+                                 email='user1@example.com')
+        generate(1, 2, 3, 4, seed=1)
+        generate(1, 2, 3, 4, seed=1)
+        self.assertEqual(User.objects.count(), 7)
+        self.assertTrue(User.objects.filter(username='run2-user0').exists())
+
+    def test_invalid_arguments(self):
+        for args in (['--platforms', '0', '--movies', '5'],
+                     ['--users', '0', '--movies', '5', '--reviews', '5'],
+                     ['--movies', '-1'],
+                     ['--base-time', 'yesterday']):
+            with self.assertRaises(CommandError):
+                call_command('generate_dataset', '--platforms', '1',
+                             '--movies', '1', '--users', '1', '--reviews',
+                             '1', *args, stdout=StringIO())
+        self.assertFalse(models.Platform.objects.exists())
+
+
+class MetricsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        models.Movies.objects.create(platform=platform, title="Example Movie",
+                                     storyline="Example story")
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('movie-list'))
+        timing = response['Server-Timing']
+        phases = dict(re.findall(r'(\w+);dur=([\d.]+)', timing))
+        self.assertEqual(set(phases),
+                         {'db', 'app', 'serialize', 'render', 'total'})
+        # Serialization is timed apart from the rest of the view.
+        self.assertGreater(float(phases['serialize']), 0)
+        # The anonymous throttle upsert and the movie list.
+        self.assertIn('desc="2 queries"', timing)
+
+        response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('movie-list'))
+        self.client.get(reverse('movie-list'))
+        self.client.get(reverse('async-movie-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count'
+                      '{route="movie-list"} 2', body)
+        self.assertIn('http_request_queries_bucket'
+                      '{route="movie-list",le="1"} 1', body)
+        self.assertIn('http_request_db_seconds_count'
+                      '{route="async-movie-list"} 1', body)
+        self.assertIn('http_request_serialize_seconds_count'
+                      '{route="movie-list"} 2', body)
+        self.assertIn('response_cache_hits_total', body)
+        self.assertIn('token_cache_size', body)
+        self.assertNotIn('route="metrics"', body)
+
+    def test_queue_stats_are_reused(self):
+        self.client.get(reverse('metrics'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('metrics'))
+        self.assertIn('task_queue_tasks{status="pending"}',
+                      response.content.decode())
+
+    async def test_async_views_run_concurrently(self):
+        async def slow(view, request):
+            await asyncio.sleep(0.25)
+            return Response([])
+
+        url = reverse('async-movie-list')
+        with mock.patch.object(MoviesAsyncAV, 'get', slow):
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                self.async_client.get(url) for _ in range(4)])
+            elapsed = time.perf_counter() - start
+        # Behind the sync adapter the four sleeps would run one by one.
+        self.assertLess(elapsed, 0.75)
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('total;dur=', response['Server-Timing'])
+        body = await sync_to_async(registry.render)()
+        self.assertIn('http_request_duration_seconds_count'
+                      '{route="async-movie-list"} 4', body)
+
+
+class CompiledSerializerTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movie = models.Movies.objects.create(
+            platform=platform, title="Example Movie",
+            storyline="Example story", active=False)
+        models.Review.objects.create(review_user=self.user, rating=4,
+                                     description=None, movies=self.movie)
+
+    def assertSameOutput(self, serializer_class, queryset):
+        compiled = compile_serializer(serializer_class)
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(compiled.serialize(compiled.values(queryset))),
+            renderer.render(serializer_class(queryset, many=True).data))
+
+    def test_matches_drf_output(self):
+        movies = models.Movies.objects.select_related('platform')
+        reviews = models.Review.objects.select_related('review_user')
+        self.assertSameOutput(serializers.MovieSerializer, movies)
+        self.assertSameOutput(serializers.ReviewSerializer, reviews)
+        with timezone.override('Asia/Kolkata'):
+            self.assertSameOutput(serializers.ReviewSerializer, reviews)
+
+    def test_nested_serializer_not_compiled(self):
+        with self.assertRaises(NotCompilable):
+            compile_serializer(serializers.PlatformSerializer)
+
+    def test_list_endpoints(self):
+        response = self.client.get(reverse('review-list',
+                                           args=(self.movie.pk,)))
+        self.assertEqual(response.data['results'], serializers.ReviewSerializer(
+            models.Review.objects.all(), many=True).data)
+        self.assertEqual(response.data['results'][0]['review_user'], 'example')
+
+        response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response.data[0]['platform'], 'Netflix')
+        self.assertFalse(response.data[0]['active'])
+
+    def test_benchmark_serializers(self):
+        out = StringIO()
+        call_command('benchmark_serializers', '--rows', '50', '--runs', '1',
+                     '--in-place', stdout=out)
+        self.assertIn('movies', out.getvalue())
+        self.assertIn('reviews', out.getvalue())
+
+
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.stream = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movie = models.Movies.objects.create(
+            platform=self.stream, title="Example Movie",
+            storyline="Example Movie")
+
+    def assert_revalidates(self, url, queries=0, last_modified=True):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Nothing is serialized for an unchanged resource.
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        if last_modified:
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+
+        models.Review.objects.create(review_user=self.user, rating=3,
+                                     movies=self.movie)
+        rebuild_rating_aggregates()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_movie_detail(self):
+        # Detail validators come from the row: one indexed query.
+        self.assert_revalidates(reverse('movie-detail', args=(self.movie.pk,)),
+                                queries=1, last_modified=False)
+
+    def test_platform_detail(self):
+        self.assert_revalidates(reverse('platform-detail',
+                                        args=(self.stream.pk,)),
+                                queries=1, last_modified=False)
+
+    def test_async_movie_detail(self):
+        self.assert_revalidates(reverse('async-movie-detail',
+                                        args=(self.movie.pk,)),
+                                queries=1, last_modified=False)
+
+    def test_async_platform_detail(self):
+        self.assert_revalidates(reverse('async-platform-detail',
+                                        args=(self.stream.pk,)),
+                                queries=1, last_modified=False)
+
+    def test_detail_etag_follows_the_row(self):
+        url = reverse('movie-detail', args=(self.movie.pk,))
+        etag = self.client.get(url)['ETag']
+        # A review elsewhere leaves this movie's ETag alone.
+        other = models.Movies.objects.create(
+            platform=self.stream, title="Other", storyline="Other")
+        self.client.post(reverse('review-create', args=(other.pk,)),
+                         {'rating': 4})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A write another worker made: no signal, no version bump here.
+        models.Movies.objects.filter(pk=self.movie.pk).update(
+            storyline="Changed")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['storyline'], "Changed")
+
+        response = self.client.get(reverse('movie-detail', args=(999,)),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_movie_update_changes_etag(self):
+        url = reverse('movie-detail', args=(self.movie.pk,))
+        etag = self.client.get(url)['ETag']
+        self.movie.title = "Renamed Movie"
+        self.movie.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], "Renamed Movie")
+
+    def test_query_params_change_etag(self):
+        url = reverse('review-list', args=(self.movie.pk,))
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url + '?active=true',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class KeysetPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        stream = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movie = models.Movies.objects.create(
+            platform=stream, title="Example Movie", storyline="Example")
+        users = User.objects.bulk_create([
+            User(username='reviewer%d' % i) for i in range(45)])
+        models.Review.objects.bulk_create([
+            models.Review(movies=self.movie, review_user=user, rating=3)
+            for user in users])
+        # Ties on created are what broke the old created-only cursor.
+        models.Review.objects.update(created=timezone.now())
+        self.url = reverse('review-list', args=(self.movie.pk,))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            cache.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(review['id'] for review in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_every_row_once(self):
+        ids = self.walk(self.url + '?size=10')
+        self.assertEqual(ids, sorted(models.Review.objects.values_list(
+            'id', flat=True)))
+
+    def test_concurrent_inserts(self):
+        response = self.client.get(self.url + '?size=10')
+        first = [review['id'] for review in response.data['results']]
+        late = User.objects.create_user(username="late")
+        models.Review.objects.create(movies=self.movie, review_user=late,
+                                     rating=5)
+        rest = self.walk(response.data['next'])
+        self.assertEqual(len(first + rest), 46)
+        self.assertEqual(len(set(first + rest)), 46)
+
+        previous = self.client.get(self.client.get(
+            response.data['next']).data['previous'])
+        self.assertEqual([review['id'] for review in
+                          previous.data['results']], first)
+        self.assertIsNone(previous.data['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=bm9wZQ==')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor_positions(self):
+        positions = ['["notadate",1]', '[null,1]',
+                     '["2020-01-01T00:00:00Z","x"]', '[{"a":1},1]',
+                     '["2020-01-01T00:00:00",1]',
+                     '["2020-01-01T00:00:00Z",1e999]']
+        urls = [(self.url, 'cursor'), (reverse('watch-list'), 'record')]
+        for position in positions:
+            # The same encoding CursorPagination.encode_cursor uses.
+            token = base64.b64encode(
+                urlencode({'p': position}).encode()).decode()
+            for url, param in urls:
+                with self.subTest(url=url, position=position):
+                    response = self.client.get(url, {param: token})
+                    self.assertEqual(response.status_code,
+                                     status.HTTP_404_NOT_FOUND)
+
+    def test_user_reviews_and_movies_paginate(self):
+        response = self.client.get(reverse('user-review-detail') +
+                                   '?username=reviewer3')
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get(reverse('async-review-list',
+                                           args=(self.movie.pk,)))
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_seek_uses_index(self):
+        queryset = models.Review.objects.filter(movies=self.movie).filter(
+            Q(created__gt=timezone.now()) | Q(
+                created=timezone.now(), id__gt=1)).order_by('created', 'id')
+        self.assertIn('review_movie_created_idx', queryset.explain())
+
+
+class DatabaseProfileTestCase(APITestCase):
+
+    def test_production_profile(self):
+        databases = sqlite_databases('db.sqlite3', 'production')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 600)
+        self.assertEqual(databases['default']['OPTIONS']['transaction_mode'],
+                         'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode = WAL',
+                      databases['default']['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA query_only = ON',
+                      databases['replica']['OPTIONS']['init_command'])
+        self.assertEqual(databases['throttle']['NAME'],
+                         'db-throttle.sqlite3')
+        self.assertEqual(list(sqlite_databases('db.sqlite3')), ['default'])
+
+    def test_router(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(models.Movies), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'moviesinfo'))
+        # Test cases run inside a transaction, which pins reads to the
+        # primary so they can see its uncommitted writes.
+        self.assertEqual(router.db_for_read(models.Movies), 'default')
+
+    def test_throttle_router(self):
+        router = ThrottleRouter()
+        self.assertEqual(router.db_for_write(models.ThrottleCounter),
+                         'throttle')
+        self.assertEqual(router.db_for_read(models.ThrottleCounter),
+                         'throttle')
+        self.assertIsNone(router.db_for_read(models.Movies))
+        self.assertTrue(router.allow_migrate('throttle', 'moviesinfo',
+                                             'throttlecounter'))
+        self.assertFalse(router.allow_migrate('default', 'moviesinfo',
+                                              'throttlecounter'))
+        # RunPython steps come without a model name.
+        self.assertFalse(router.allow_migrate('throttle', 'moviesinfo'))
+        self.assertIsNone(router.allow_migrate('default', 'moviesinfo',
+                                               'movies'))
+
+    def test_router_outside_transaction(self):
+        router = PrimaryReplicaRouter()
+        with mock.patch.object(connections['default'], 'in_atomic_block',
+                               False):
+            self.assertEqual(router.db_for_read(models.Movies), 'replica')
+
+    def test_benchmark_concurrency(self):
+        out = StringIO()
+        call_command('benchmark_concurrency', '--seconds', '0.2',
+                     '--readers', '2', '--writers', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith('development'))
+        self.assertTrue(lines[2].startswith('production'))
+        self.assertEqual(lines[2].split()[3], '0')
+
+
+class PlatformStatsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.netflix = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.prime = models.Platform.objects.create(
+            name="Prime", about="Streaming",
+            website="https://www.primevideo.com")
+        self.movie = models.Movies.objects.create(
+            platform=self.netflix, title="Example Movie", storyline="Story")
+        models.Movies.objects.create(platform=self.netflix, title="Hidden",
+                                     storyline="Story", active=False)
+
+    def stats(self):
+        return list(models.PlatformStats.objects.order_by('platform').values())
+
+    def assertMatchesRebuild(self):
+        # Review writes leave the platform counts to the task queue.
+        call_command('run_tasks', '--once', stdout=StringIO())
+        incremental = self.stats()
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertEqual(incremental, self.stats())
+        return incremental
+
+    def test_incremental_updates(self):
+        self.client.post(reverse('review-create', args=(self.movie.pk,)),
+                         {'rating': 4, 'description': 'Good'})
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(stats[0]['movie_count'], 2)
+        self.assertEqual(stats[0]['active_count'], 1)
+        self.assertEqual(stats[0]['review_count'], 1)
+        self.assertEqual(stats[0]['avg_rating'], 4.0)
+
+        review = models.Review.objects.get()
+        self.client.put(reverse('review-detail', args=(review.pk,)),
+                        {'rating': 2, 'description': 'Meh'})
+        self.assertEqual(self.assertMatchesRebuild()[0]['avg_rating'], 2.0)
+
+        # Moving a movie takes its reviews to the other platform.
+        self.movie.refresh_from_db()
+        self.movie.platform = self.prime
+        self.movie.save()
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(stats[1]['review_count'], 1)
+        self.assertEqual(stats[0]['review_count'], 0)
+
+        self.netflix.name = "Netflix Plus"
+        self.netflix.save()
+        self.client.delete(reverse('review-detail', args=(review.pk,)))
+        self.movie.delete()
+        stats = self.assertMatchesRebuild()
+        self.assertEqual(stats[0]['name'], "Netflix Plus")
+        self.assertEqual(stats[1]['movie_count'], 0)
+
+        self.prime.delete()
+        self.assertEqual(models.PlatformStats.objects.count(), 1)
+
+    def test_leaderboard(self):
+        self.client.post(reverse('review-create', args=(self.movie.pk,)),
+                         {'rating': 5})
+        call_command('run_tasks', '--once', stdout=StringIO())
+        # Answered from the stats table alone; the token is cached.
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('platform-leaderboard'))
+        self.assertEqual([row['name'] for row in response.data],
+                         ['Netflix', 'Prime'])
+        self.assertEqual(response.data[0]['review_count'], 1)
+
+        response = self.client.get(reverse('platform-leaderboard') +
+                                   '?ordering=-name')
+        self.assertEqual([row['name'] for row in response.data],
+                         ['Prime', 'Netflix'])
+
+    def test_bulk_paths(self):
+        reviewers = User.objects.bulk_create([
+            User(username='reviewer%d' % i) for i in range(3)])
+        self.user.is_staff = True
+        self.user.save()
+        self.client.post(reverse('review-batch'), [
+            {'movies': self.movie.pk, 'rating': 3,
+             'review_user': user.username} for user in reviewers],
+            format='json')
+        self.assertEqual(self.assertMatchesRebuild()[0]['review_count'], 3)
+
+        generate(2, 10, 10, 30, seed=1)
+        self.assertEqual(models.PlatformStats.objects.count(), 4)
+        self.assertMatchesRebuild()
+
+
+@override_settings(RANKING_PRIOR_WEIGHT=5, RANKING_HALF_LIFE_DAYS=7)
+class RankingsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = User.objects.bulk_create([
+            User(username='reviewer%d' % i) for i in range(6)])
+        platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.single, self.many, self.low, self.hidden = [
+            models.Movies.objects.create(platform=platform, title=title,
+                                         storyline="Story", active=active)
+            for title, active in (("Single", True), ("Many", True),
+                                  ("Low", True), ("Hidden", False))]
+        self.now = timezone.now()
+
+    def review(self, movie, ratings, days=0):
+        reviews = models.Review.objects.bulk_create([
+            models.Review(movies=movie, review_user=user, rating=rating)
+            for user, rating in zip(self.users, ratings)])
+        models.Review.objects.filter(pk__in=[r.pk for r in reviews]).update(
+            created=self.now - timezone.timedelta(days=days))
+        rebuild_rating_aggregates()
+
+    def titles(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['movie']['title'] for row in response.data]
+
+    def test_top_rated(self):
+        # A single 5-star review no longer beats a well-reviewed movie.
+        self.review(self.single, [5])
+        self.review(self.many, [5, 5, 5, 5, 5, 4])
+        self.review(self.low, [1, 1, 1])
+        self.review(self.hidden, [5, 5, 5, 5, 5, 5])
+        refresh_rankings(full=True, now=self.now)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.titles('movie-top-rated'),
+                             ['Many', 'Single', 'Low'])
+        score = models.MovieScore.objects.get(movie=self.single)
+        mean = (5 + 29 + 3 + 30) / 16
+        self.assertAlmostEqual(score.bayesian, (5 * mean + 5) / 6)
+
+        response = self.client.get(reverse('movie-top-rated') + '?limit=1')
+        self.assertEqual(len(response.data), 1)
+        response = self.client.get(reverse('movie-top-rated') + '?limit=x')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trending(self):
+        self.review(self.many, [5, 5, 5], days=30)
+        self.review(self.single, [3])
+        self.review(self.low, [5], days=400)
+        refresh_rankings(full=True, now=self.now)
+        # Reviews older than the window leave the movie out entirely.
+        self.assertEqual(self.titles('movie-trending'), ['Single', 'Many'])
+
+        score = models.MovieScore.objects.get(movie=self.many)
+        created = self.now - timezone.timedelta(days=30)
+        self.assertAlmostEqual(score.trending, math.log2(3) + (
+            created - EPOCH).total_seconds() / (7 * 86400))
+
+    @override_settings(RANKING_BATCH_SIZE=1)
+    def test_incremental_matches_full(self):
+        self.review(self.many, [4, 5], days=3)
+        self.review(self.single, [2], days=1)
+        call_command('refresh_rankings', stdout=StringIO())
+
+        # Only the new reviews are read on the next run.
+        reviews = models.Review.objects.bulk_create([
+            models.Review(movies=self.single, review_user=self.users[1],
+                          rating=5),
+            models.Review(movies=self.low, review_user=self.users[0],
+                          rating=3)])
+        models.Review.objects.filter(pk__in=[r.pk for r in reviews]).update(
+            created=self.now)
+        rebuild_rating_aggregates()
+        refresh_rankings()
+        incremental = {movie: (bayesian, trending) for movie, bayesian, trending
+                       in models.MovieScore.objects.values_list(
+                           'movie', 'bayesian', 'trending')}
+
+        out = StringIO()
+        call_command('refresh_rankings', '--full', stdout=out)
+        self.assertIn('Updated rankings for 4 movies', out.getvalue())
+        full = {movie: (bayesian, trending) for movie, bayesian, trending
+                in models.MovieScore.objects.values_list(
+                    'movie', 'bayesian', 'trending')}
+        self.assertEqual(full[self.hidden.pk][1], None)
+        self.assertEqual(incremental.keys(), full.keys())
+        for movie, (bayesian, score) in full.items():
+            # Untouched movies follow the prior too.
+            self.assertAlmostEqual(incremental[movie][0], bayesian)
+            if score is None:
+                self.assertIsNone(incremental[movie][1])
+            else:
+                self.assertAlmostEqual(incremental[movie][1], score)
+
+    def test_overlapping_runs(self):
+        self.review(self.many, [4, 5], days=3)
+        refresh_rankings()
+        self.review(self.single, [2, 3], days=1)
+
+        # A second run starts and finishes while the first one is reading.
+        prior = rankings.prior
+        overlapped = []
+
+        def overlap():
+            if not overlapped:
+                overlapped.append(None)
+                overlapped.append(refresh_rankings())
+            return prior()
+        with mock.patch('moviesinfo.rankings.prior', side_effect=overlap):
+            self.assertEqual(refresh_rankings(), 0)
+        self.assertEqual(overlapped, [None, 1])
+
+        incremental = dict(models.MovieScore.objects.values_list(
+            'movie', 'trending'))
+        refresh_rankings(full=True, now=self.now)
+        self.assertAlmostEqual(incremental[self.single.pk],
+                               models.MovieScore.objects.get(
+                                   movie=self.single).trending)
+
+    def test_cache_invalidated(self):
+        self.review(self.single, [4])
+        refresh_rankings()
+        self.assertEqual(self.titles('movie-top-rated'),
+                         ['Single', 'Many', 'Low'])
+        self.review(self.many, [5, 5])
+        refresh_rankings()
+        self.assertEqual(self.titles('movie-top-rated')[0], 'Many')
+
+
+class SimilarMoviesTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = User.objects.bulk_create([
+            User(username='reviewer%d' % i) for i in range(4)])
+        platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movies = [
+            models.Movies.objects.create(platform=platform, title=title,
+                                         storyline="Story", active=active)
+            for title, active in (("A", True), ("B", True), ("C", True),
+                                  ("D", True), ("Hidden", False))]
+
+    def review(self, user, movie, rating):
+        models.Review.objects.create(review_user=self.users[user],
+                                     movies=self.movies[movie], rating=rating)
+
+    def neighbors(self):
+        # Compared by score so equal scores may break ties either way.
+        neighbors = {}
+        for movie, score in models.MovieNeighbor.objects.order_by(
+                'movie', '-score').values_list('movie', 'score'):
+            neighbors.setdefault(movie, []).append(round(score, 5))
+        return neighbors
+
+    def test_similar_movies(self):
+        for user, movie, rating in ((0, 0, 5), (0, 1, 5), (1, 0, 4),
+                                    (1, 1, 4), (2, 0, 5), (2, 2, 1),
+                                    (2, 4, 5), (3, 3, 3)):
+            self.review(user, movie, rating)
+        call_command('refresh_similar', stdout=StringIO())
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('movie-similar', args=(self.movies[0].pk,)))
+        self.assertEqual([row['movie']['title'] for row in response.data],
+                         ['B', 'C'])
+        # Cosine of the two rating columns over all users.
+        a, b = np.array([5, 4, 5, 0]), np.array([5, 4, 0, 0])
+        self.assertAlmostEqual(response.data[0]['score'], a @ b / (
+            np.linalg.norm(a) * np.linalg.norm(b)), places=5)
+
+        response = self.client.get(
+            reverse('movie-similar', args=(self.movies[3].pk,)))
+        self.assertEqual(response.data, [])
+        response = self.client.get(reverse('movie-similar', args=(999,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(SIMILARITY_NEIGHBORS=3, SIMILARITY_BLOCK_SIZE=4)
+    def test_incremental_matches_full(self):
+        generate(2, 25, 30, 250, seed=5)
+        refresh_similar(full=True)
+
+        # New reviews, an edited rating and a hidden review all count as
+        # changes to the movie's column.
+        movies = list(models.Movies.objects.order_by('pk'))
+        users = list(User.objects.order_by('pk'))
+        for i, user in enumerate(users[:6]):
+            models.Review.objects.get_or_create(
+                review_user=user, movies=movies[-1 - i % 3],
+                defaults={'rating': 1 + i % 5})
+        edited = models.Review.objects.order_by('pk')[10]
+        edited.rating = 6 - edited.rating
+        edited.save()
+        hidden = models.Review.objects.order_by('pk')[20]
+        hidden.active = False
+        hidden.save()
+
+        refresh_similar()
+        incremental = self.neighbors()
+        out = StringIO()
+        call_command('refresh_similar', '--full', stdout=out)
+        self.assertIn('Updated similar movies for', out.getvalue())
+        self.assertEqual(incremental, self.neighbors())
+        self.assertTrue(all(len(scores) <= 3
+                            for scores in incremental.values()))
+
+        # A new movie rated exactly like an untouched one only reaches that
+        # movie's list through the merge.
+        latest = models.Review.objects.latest('update').movies_id
+        source = models.Movies.objects.filter(number_rating__gt=2).exclude(
+            pk=latest).exclude(neighbors__neighbor=latest).first()
+        twin = models.Movies.objects.create(
+            platform=source.platform, title="Twin", storyline="Story")
+        models.Review.objects.bulk_create([
+            models.Review(movies=twin, review_user_id=user, rating=rating)
+            for user, rating in source.reviews.values_list(
+                'review_user', 'rating')])
+        refresh_similar()
+        self.assertEqual(models.MovieNeighbor.objects.filter(
+            movie=source).order_by('-score').first().neighbor, twin)
+        incremental = self.neighbors()
+        refresh_similar(full=True)
+        self.assertEqual(incremental, self.neighbors())
+
+    @override_settings(SIMILARITY_NEIGHBORS=3, SIMILARITY_BLOCK_SIZE=4)
+    def test_incremental_sees_deleted_reviews(self):
+        generate(2, 25, 30, 250, seed=5)
+        refresh_similar(full=True)
+
+        gone = models.MovieNeighbor.objects.values_list(
+            'neighbor', flat=True).first()
+        models.Review.objects.filter(movies=gone).delete()
+        models.Review.objects.exclude(movies=gone).order_by('pk').first() \
+            .delete()
+        refresh_similar()
+        self.assertFalse(models.MovieNeighbor.objects.filter(
+            Q(movie=gone) | Q(neighbor=gone)).exists())
+        self.assertFalse(models.RemovedReview.objects.exists())
+        incremental = self.neighbors()
+        refresh_similar(full=True)
+        self.assertEqual(incremental, self.neighbors())
+
+    @override_settings(SIMILARITY_BLOCK_SIZE=1)
+    def test_full_rebuild_drops_stale_lists(self):
+        for user, movie, rating in ((0, 0, 5), (1, 0, 4), (0, 1, 5),
+                                    (1, 1, 4), (0, 2, 3)):
+            self.review(user, movie, rating)
+        refresh_similar(full=True)
+        self.assertEqual(set(self.neighbors()), {
+            self.movies[0].pk, self.movies[1].pk, self.movies[2].pk})
+
+        # A movie with no active reviews left loses its list.
+        models.Review.objects.filter(movies=self.movies[2]).update(
+            active=False)
+        refresh_similar(full=True)
+        self.assertEqual(set(self.neighbors()), {
+            self.movies[0].pk, self.movies[1].pk})
+
+    def test_collected_scores_are_truncated(self):
+        generate(1, 12, 20, 150, seed=3)
+        matrix, movie_ids = review_matrix()
+        normalized = normalize_columns(matrix)
+        columns = np.arange(3)
+        rows, cols, scores = rebuild_neighbors(
+            normalized, movie_ids, columns, 2, 1, collect=True)
+        # At most k scores per other movie, the best ones.
+        self.assertFalse(np.isin(cols, columns).any())
+        self.assertLessEqual(np.bincount(cols).max(), 2)
+        full = similarities(normalized, columns)
+        for col in np.unique(cols):
+            best = np.sort(full[2][full[1] == col])[::-1][:2]
+            np.testing.assert_allclose(np.sort(scores[cols == col])[::-1],
+                                       best)
+
+
+class RatingHistogramTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movie = models.Movies.objects.create(
+            platform=platform, title="Example Movie", storyline="Story")
+
+    def histogram(self):
+        cache.clear()
+        # The ETag row lookup and the movie.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('movie-detail',
+                                               args=(self.movie.pk,)))
+        return response.data['rating_histogram']
+
+    def test_counters_follow_reviews(self):
+        self.client.post(reverse('review-create', args=(self.movie.pk,)),
+                         {'rating': 4, 'description': 'Good'})
+        self.assertEqual(self.histogram(),
+                         {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0})
+
+        review = models.Review.objects.get()
+        self.client.put(reverse('review-detail', args=(review.pk,)),
+                        {'rating': 2, 'description': 'Meh'})
+        self.assertEqual(self.histogram()['2'], 1)
+        self.assertEqual(self.histogram()['4'], 0)
+
+        self.user.is_staff = True
+        self.user.save()
+        reviewers = User.objects.bulk_create([
+            User(username='reviewer%d' % i) for i in range(3)])
+        self.client.post(reverse('review-batch'), [
+            {'movies': self.movie.pk, 'rating': 5,
+             'review_user': user.username} for user in reviewers],
+            format='json')
+        self.assertEqual(self.histogram()['5'], 3)
+
+        self.client.delete(reverse('review-detail', args=(review.pk,)))
+        self.assertEqual(self.histogram(),
+                         {'1': 0, '2': 0, '3': 0, '4': 0, '5': 3})
+        call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+        # List payloads stay as they were.
+        response = self.client.get(reverse('movie-list'))
+        self.assertNotIn('rating_5', response.data[0])
+
+    def test_same_total_moves_stars(self):
+        update_rating_aggregates(self.movie.pk, added=[5, 3])
+        update_rating_aggregates(self.movie.pk, added=[4, 4],
+                                 removed=[5, 3])
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_3, self.movie.rating_4,
+                          self.movie.rating_5), (0, 2, 0))
+        self.assertEqual(self.movie.number_rating, 2)
+
+    def test_verify(self):
+        generate(2, 10, 10, 60, seed=2)
+        out = StringIO()
+        call_command('rebuild_ratings', '--verify', stdout=out)
+        self.assertIn('match', out.getvalue())
+
+        movie = models.Movies.objects.filter(number_rating__gt=0).first()
+        models.Movies.objects.filter(pk=movie.pk).update(rating_3=99)
+        with self.assertRaisesMessage(CommandError, str(movie.pk)):
+            call_command('rebuild_ratings', '--verify', stdout=StringIO())
+        self.assertEqual(models.Movies.objects.get(pk=movie.pk).rating_3, 99)
+
+        call_command('rebuild_ratings', stdout=StringIO())
+        call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+
+calls = []
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky(fail):
+    calls.append(fail)
+    if fail:
+        raise RuntimeError('flaky task failed')
+
+
+class TaskQueueTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+        self.user = User.objects.create_user(username="example",
+                                             password="Password@123")
+        self.token = Token.objects.get(user__username=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.platform = models.Platform.objects.create(
+            name="Netflix", about="#1 Platform",
+            website="https://www.netflix.com")
+        self.movies = [models.Movies.objects.create(
+            platform=self.platform, title="Movie %d" % i, storyline="Story")
+            for i in range(2)]
+
+    def review_count(self):
+        return models.PlatformStats.objects.get(
+            platform=self.platform).review_count
+
+    @mock.patch('moviesinfo.tasks.is_shared', return_value=True)
+    def test_review_writes_coalesce(self, is_shared):
+        for movie in self.movies:
+            response = self.client.post(
+                reverse('review-create', args=(movie.pk,)), {'rating': 4})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The movie counters are exact at once; the platform follows.
+        self.assertEqual(models.Movies.objects.get(
+            pk=self.movies[0].pk).number_rating, 1)
+        self.assertEqual(self.review_count(), 0)
+        self.assertEqual(sorted(models.Task.objects.values_list(
+            'name', flat=True)), [
+            'moviesinfo.tasks.recount_platform_stats',
+            'moviesinfo.tasks.update_rankings',
+            'moviesinfo.tasks.update_similar',
+            'moviesinfo.tasks.warm_cache'])
+
+        out = StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertIn('1 tasks done', out.getvalue())
+        self.assertEqual(self.review_count(), 2)
+        # The delayed refreshes wait for their window.
+        self.assertEqual(models.Task.objects.count(), 3)
+        models.Task.objects.update(run_after=timezone.now())
+        run_workers(drain=True)
+        self.assertFalse(models.Task.objects.exists())
+        self.assertTrue(models.MovieScore.objects.exists())
+
+    def test_no_warming_of_a_local_cache(self):
+        self.client.post(reverse('review-create', args=(self.movies[0].pk,)),
+                         {'rating': 4})
+        self.assertFalse(models.Task.objects.filter(
+            name='moviesinfo.tasks.warm_cache').exists())
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager(self):
+        self.client.post(reverse('review-create', args=(self.movies[0].pk,)),
+                         {'rating': 4})
+        self.assertEqual(self.review_count(), 1)
+        self.assertFalse(models.Task.objects.exists())
+
+    def test_retry_then_fail(self):
+        enqueue(flaky, True)
+        enqueue(flaky, True)
+        self.assertEqual(run_workers(drain=True), (0, 1))
+        retried = models.Task.objects.get()
+        self.assertEqual((retried.status, retried.attempts), ('pending', 1))
+        self.assertGreater(retried.run_after, timezone.now())
+        self.assertIn('flaky task failed', retried.last_error)
+
+        models.Task.objects.update(run_after=timezone.now())
+        run_workers(drain=True)
+        failed = models.Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+        self.assertEqual(calls, [True, True])
+
+        # A failed task does not block a new identical one.
+        enqueue(flaky, False)
+        self.assertEqual(run_workers(drain=True), (1, 0))
+        out = StringIO()
+        call_command('run_tasks', '--status', stdout=out)
+        self.assertIn('failed 1', out.getvalue())
+        self.assertIn('RuntimeError: flaky task failed', out.getvalue())
+
+    def test_expired_lease_is_reclaimed(self):
+        enqueue(flaky, False)
+        self.assertIsNotNone(claim())
+        self.assertIsNone(claim())
+        models.Task.objects.update(
+            started=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(claim().attempts, 2)
+
+    def test_overlapping_claims(self):
+        enqueue(flaky, False)
+        first = claim()
+        # A copy queued while the first runs waits for it.
+        enqueue(flaky, False)
+        self.assertIsNone(claim())
+
+        # Once the lease runs out the stale run is taken over, still
+        # without the copy running beside it.
+        models.Task.objects.filter(pk=first.pk).update(
+            started=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(claim().pk, first.pk)
+        self.assertIsNone(claim())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Task.objects.filter(status='pending').update(
+                status='running')
+
+        self.assertEqual(run_workers(drain=True), (0, 0))
+        models.Task.objects.filter(pk=first.pk).delete()
+        self.assertEqual(run_workers(drain=True), (1, 0))
+        self.assertEqual(calls, [False])
+
+    def test_warm_cache(self):
+        warm_cache()
+        self.client.credentials()
+        response = self.client.get(reverse('movie-list'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    @override_settings(CACHE_WARM_HOST='movies.example.com',
+                       CACHE_WARM_SECURE=True,
+                       ALLOWED_HOSTS=['testserver', 'movies.example.com'])
+    def test_warm_cache_host(self):
+        for i in range(6):
+            models.Movies.objects.create(
+                platform=self.platform, title="Extra %d" % i,
+                storyline="Story")
+        warm_cache()
+        self.client.credentials()
+        response = self.client.get(reverse('watch-list'),
+                                   HTTP_HOST='movies.example.com',
+                                   secure=True)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertTrue(response.data['next'].startswith(
+            'https://movies.example.com/'))
+        response = self.client.get(reverse('watch-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_metrics(self):
+        enqueue(flaky, False)
+        response = self.client.get(reverse('metrics'))
+        self.assertIn('task_queue_tasks{status="pending"} 1',
+                      response.content.decode())
+
+
+class PurgeTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        generate(3, 30, 20, 300, seed=5)
+        refresh_rankings()
+        refresh_similar()
+        self.platform = models.Platform.objects.order_by('pk').first()
+        self.movie = models.Movies.objects.exclude(
+            platform=self.platform).order_by('pk').first()
+
+    def counts(self):
+        return {model._meta.label: model.objects.count() for model in (
+            models.Platform, models.PlatformStats, models.Movies,
+            models.Review, models.MovieScore, models.MovieNeighbor)}
+
+    def test_matches_cascade_delete(self):
+        before = self.counts()
+        with transaction.atomic():
+            _, expected = models.Platform.objects.filter(
+                pk=self.platform.pk).delete()
+            transaction.set_rollback(True)
+
+        out = StringIO()
+        call_command('purge_catalog', '--platform', str(self.platform.pk),
+                     '--batch-size', '7', stdout=out)
+        after = self.counts()
+        self.assertEqual({label: before[label] - after[label]
+                          for label in before},
+                         {label: expected.get(label, 0) for label in before})
+        self.assertIn('moviesinfo.Review: 7 deleted', out.getvalue())
+        self.assertIn('%d moviesinfo.Review' % expected['moviesinfo.Review'],
+                      out.getvalue())
+        call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+    def test_delete_movie(self):
+        stats = models.PlatformStats.objects.get(platform=self.movie.platform)
+        movie_count = stats.movie_count
+        user = User.objects.create_user(username="admin",
+                                        password="Password@123", is_staff=True)
+        self.client.force_authenticate(user)
+        self.client.get(reverse('platform-leaderboard'))
+
+        response = self.client.delete(reverse('movie-detail',
+                                              args=(self.movie.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(models.Review.objects.filter(
+            movies=self.movie.pk).exists())
+        self.assertFalse(models.MovieScore.objects.filter(
+            movie=self.movie.pk).exists())
+        self.assertFalse(models.MovieNeighbor.objects.filter(
+            Q(movie=self.movie.pk) | Q(neighbor=self.movie.pk)).exists())
+
+        # Platform stats and cached responses follow without the signals.
+        stats.refresh_from_db()
+        self.assertEqual(stats.movie_count, movie_count - 1)
+        self.assertEqual(stats.review_count, models.Review.objects.filter(
+            movies__platform=self.movie.platform).count())
+        response = self.client.get(reverse('platform-leaderboard'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        response = self.client.get(reverse('movie-search') + '?q=' +
+                                   self.movie.title)
+        self.assertNotIn(self.movie.pk,
+                         [movie['id'] for movie in response.data['results']])
+
+    def test_requires_a_target(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_catalog', stdout=StringIO())
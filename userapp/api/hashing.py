@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework.exceptions import Throttled
+
+
+class HashingPool:
+    """
+    Run password hashing on a fixed number of threads so a signup spike
+    cannot take every CPU from the other requests. At most ``queue`` callers
+    wait for a thread; the rest are turned away with a 429 after
+    ``timeout`` seconds instead of piling up.
+    """
+
+    def __init__(self, workers, queue, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='password-hashing')
+            return self._executor
+
+    def make_password(self, password):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Throttled(detail='Too many registrations in progress, '
+                                   'retry shortly.')
+        try:
+            return self.executor().submit(make_password, password).result()
+        finally:
+            self._slots.release()
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 2),
+    queue=getattr(settings, 'PASSWORD_HASHING_QUEUE', 32),
+    timeout=getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 5))
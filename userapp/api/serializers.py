@@ -1,6 +1,10 @@
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
+from userapp.api.hashing import hashing_pool
+
 
 class RegistrationSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(style={'input_type': 'password'}, write_only=True)
@@ -9,7 +13,11 @@ class RegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'email', 'password', 'password2']
         extra_kwargs = {
-            'password' : {'write_only': True}
+            'password' : {'write_only': True},
+            'email': {'required': True, 'allow_blank': False},
+            # Uniqueness is settled by the database constraints in save();
+            # a query beforehand cannot stop two signups racing.
+            'username': {'validators': [UnicodeUsernameValidator()]},
         }
     
     def save(self):
@@ -21,14 +29,29 @@ class RegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'error': 'P1 and P2 should be same!'})
 
-        if User.objects.filter(
-            email=self.validated_data['email']).exists():
+        email = self.validated_data['email']
+        username = self.validated_data['username']
+        # An indexed lookup is cheap next to a PBKDF2 hash; the common
+        # duplicate never reaches the pool.
+        if User.objects.filter(username=username).exists():
             raise serializers.ValidationError(
-                {'error': 'Email already exists!'})
-
-        account = User(email=self.validated_data['email'], 
-                       username=self.validated_data['username'])
-        account.set_password(password)
-        account.save()
+                {'username': ['A user with that username already exists.']})
+
+        # Hashed before the transaction so no write lock is held meanwhile.
+        account = User(email=email, username=username,
+                       password=hashing_pool.make_password(password))
+        try:
+            # The create_auth_token receiver adds the token in the same
+            # transaction.
+            with transaction.atomic():
+                account.save()
+        except IntegrityError:
+            # Lost a race with another signup; the error text differs per
+            # backend, so ask which row is there now.
+            if User.objects.filter(email__iexact=email).exists():
+                raise serializers.ValidationError(
+                    {'error': 'Email already exists!'})
+            raise serializers.ValidationError(
+                {'username': ['A user with that username already exists.']})
 
         return account
\ No newline at end of file
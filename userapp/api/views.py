@@ -1,6 +1,5 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
 from rest_framework import status
 # from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -31,8 +30,8 @@ def registration_view(request):
             data['username'] = account.username
             data['email'] = account.email
 
-            token = Token.objects.get(user=account).key
-            data['token'] = token
+            # Cached on the account when the token was created.
+            data['token'] = account.auth_token.key
 
             # refresh = RefreshToken.for_user(account)
             # data['token'] = {
@@ -41,6 +40,7 @@ def registration_view(request):
             #                 }
        
         else:
-            data = serializer.errors
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
         
         return Response(data, status=status.HTTP_201_CREATED)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import math
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, \
+                    teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from moviesinfo.api.throttling import SharedRateThrottle
+from userapp.api.hashing import HashingPool
+
+
+def percentile(values, percent):
+    ordered = sorted(values) or [0]
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class Command(BaseCommand):
+    help = ('Register users from concurrent clients against a throwaway '
+            'database while other clients read the movie list, and report '
+            'registrations per second and read latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument('--registrations', type=int, default=200,
+                            help='Total signups, split over the clients.')
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--workers', type=int,
+                            help='Override PASSWORD_HASHING_WORKERS.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            # Threads need a file database; in-memory SQLite cannot be
+            # written from several connections.
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(
+                    directory, 'registration.sqlite3')
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                with mock.patch.object(SharedRateThrottle, 'allow_request',
+                                       return_value=True):
+                    results = self.run(options)
+            finally:
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        self.stdout.write('%d registrations in %.2fs: %.1f/s, p50 %.0f ms, '
+                          'p95 %.0f ms, %d throttled, %d failed' % (
+                              results['registered'], results['seconds'],
+                              results['registered'] / results['seconds'],
+                              percentile(results['register'], 50) * 1000,
+                              percentile(results['register'], 95) * 1000,
+                              results['throttled'], results['failed']))
+        self.stdout.write('%d reads meanwhile: p50 %.1f ms, p95 %.1f ms' % (
+            len(results['read']), percentile(results['read'], 50) * 1000,
+            percentile(results['read'], 95) * 1000))
+
+    def run(self, options):
+        pool = None
+        if options['workers']:
+            pool = HashingPool(workers=options['workers'], queue=32,
+                               timeout=5)
+        results = {'registered': 0, 'throttled': 0, 'failed': 0,
+                   'register': [], 'read': []}
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def register(offset, count):
+            client = Client()
+            timings, outcomes = [], []
+            for i in range(offset, offset + count):
+                start = time.perf_counter()
+                response = client.post(reverse('register'), {
+                    'username': 'signup%d' % i,
+                    'email': 'signup%d@example.com' % i,
+                    'password': 'Password@123',
+                    'password2': 'Password@123'})
+                timings.append(time.perf_counter() - start)
+                outcomes.append(response.status_code)
+            connection.close()
+            with lock:
+                results['register'].extend(timings)
+                results['registered'] += outcomes.count(201)
+                results['throttled'] += outcomes.count(429)
+                results['failed'] += len(outcomes) - outcomes.count(201) \
+                    - outcomes.count(429)
+
+        def read():
+            client = Client()
+            timings = []
+            while not done.is_set():
+                start = time.perf_counter()
+                client.get(reverse('movie-list'))
+                timings.append(time.perf_counter() - start)
+            connection.close()
+            with lock:
+                results['read'].extend(timings)
+
+        clients = options['clients']
+        share, extra = divmod(options['registrations'], clients)
+        writers, offset = [], 0
+        for i in range(clients):
+            count = share + (i < extra)
+            writers.append(threading.Thread(target=register,
+                                            args=(offset, count)))
+            offset += count
+        readers = [threading.Thread(target=read)
+                   for _ in range(options['readers'])]
+
+        patch = mock.patch('userapp.api.serializers.hashing_pool', pool) \
+            if pool else mock.patch.dict({})
+        with patch:
+            for thread in readers:
+                thread.start()
+            start = time.perf_counter()
+            for thread in writers:
+                thread.start()
+            for thread in writers:
+                thread.join()
+            results['seconds'] = time.perf_counter() - start
+            done.set()
+            for thread in readers:
+                thread.join()
+        return results
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Q, UniqueConstraint
+from django.db.models.functions import Lower
+
+
+def email_constraint():
+    # Blank emails predate required emails at signup and stay allowed.
+    return UniqueConstraint(Lower('email'), condition=~Q(email=''),
+                            name='auth_user_email_ci_unique')
+
+
+def add_email_constraint(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    duplicates = list(User.objects.exclude(email='').annotate(
+        address=Lower('email')).values('address').annotate(
+            total=Count('pk')).filter(total__gt=1).values_list(
+                'address', flat=True)[:10])
+    if duplicates:
+        raise RuntimeError('Resolve duplicate user emails before migrating: '
+                           + ', '.join(duplicates))
+    schema_editor.add_constraint(User, email_constraint())
+
+
+def remove_email_constraint(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.remove_constraint(User, email_constraint())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_constraint, remove_email_constraint),
+    ]
@@ -1,10 +1,24 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from userapp.api.authentication import token_cache
+
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
-        Token.objects.create(user=instance)
\ No newline at end of file
+        Token.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user(sender, instance=None, created=False, **kwargs):
+    # Covers deactivation as well as permission changes such as is_staff.
+    if not created:
+        token_cache.evict_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def evict_cached_token(sender, instance=None, **kwargs):
+    token_cache.evict(instance.key)
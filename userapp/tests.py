@@ -1,9 +1,17 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+
+from userapp.api.authentication import CachedTokenAuthentication, \
+                            TokenCache, token_cache
+from userapp.api.hashing import HashingPool
 
 
 class RegisterTestCase(APITestCase):
@@ -18,6 +26,91 @@ class RegisterTestCase(APITestCase):
         response = self.client.post(reverse('register'), data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def register(self, username, email, password2="NewPassword@123"):
+        return self.client.post(reverse('register'), {
+            "username": username,
+            "email": email,
+            "password": "NewPassword@123",
+            "password2": password2,
+        })
+
+    def test_user_and_token_in_one_transaction(self):
+        # Username check, then savepoint, user insert, token insert and
+        # release.
+        with self.assertNumQueries(5):
+            response = self.register("testcase", "testcase@example.com")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['token'], Token.objects.get(
+            user__username="testcase").key)
+
+    def test_duplicates_rejected_by_constraints(self):
+        self.register("testcase", "testcase@example.com")
+        response = self.register("other", "TestCase@Example.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Email already exists!')
+
+        response = self.register("testcase", "other@example.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(Token.objects.count(), 1)
+
+        # Users created without an email are not affected.
+        User.objects.create_user(username="first")
+        User.objects.create_user(username="second")
+
+    def test_taken_username_skips_hashing(self):
+        self.register("testcase", "testcase@example.com")
+        with mock.patch('userapp.api.serializers.hashing_pool') as pool:
+            response = self.register("testcase", "other@example.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        pool.make_password.assert_not_called()
+
+    def test_racing_signups(self):
+        # Another signup commits while this one is hashing.
+        def racing(username, email):
+            def make_password(password):
+                User.objects.create_user(username=username, email=email)
+                return 'hash'
+            return mock.patch(
+                'userapp.api.serializers.hashing_pool.make_password',
+                side_effect=make_password)
+
+        with racing("rival", "TestCase@example.com"):
+            response = self.register("testcase", "testcase@example.com")
+        self.assertEqual(response.data['error'], 'Email already exists!')
+
+        with racing("other", "other@example.com"):
+            response = self.register("other", "mine@example.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_invalid_input(self):
+        response = self.register("testcase", "testcase@example.com",
+                                 password2="Mismatch@123")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.register("testcase", "")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.exists())
+
+    def test_hashing_pool_bound(self):
+        pool = HashingPool(workers=1, queue=0, timeout=0.01)
+        self.assertTrue(check_password("secret", pool.make_password("secret")))
+        pool._slots.acquire()
+        with self.assertRaises(Throttled):
+            pool.make_password("secret")
+        pool._slots.release()
+
+        with mock.patch('userapp.api.serializers.hashing_pool', pool):
+            pool._slots.acquire()
+            response = self.register("testcase", "testcase@example.com")
+            pool._slots.release()
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(User.objects.exists())
+
 
 class LoginLogoutTestCase(APITestCase):
 
@@ -37,4 +130,78 @@ class LoginLogoutTestCase(APITestCase):
         self.token = Token.objects.get(user__username="example")
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
         response = self.client.post(reverse('logout'))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class TokenCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="example",
+                                             password="NewPassword@123")
+        self.token = Token.objects.get(user__username="example")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_cached_credentials(self):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+        hits = token_cache.stats()['hits']
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_logout_evicts_token(self):
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_evicts_user(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+    def test_requests_get_their_own_user(self):
+        authentication = CachedTokenAuthentication()
+        user, token = authentication.authenticate_credentials(self.token.key)
+        user.first_name = 'Changed'
+        user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.first_name, '')
+        self.assertIs(token.user, user)
+        user.first_name = 'Changed'
+        self.assertEqual(authentication.authenticate_credentials(
+            self.token.key)[0].first_name, '')
+
+    def test_evict_user_drops_only_their_tokens(self):
+        other = User.objects.create_user(username="other",
+                                          password="NewPassword@123")
+        cache = TokenCache(maxsize=10, ttl=60)
+        cache.set('a', self.user, None)
+        cache.set('b', self.user, None)
+        cache.set('c', other, None)
+        cache.evict_user(self.user.pk)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c')[0], other)
+        self.assertEqual(cache._user_keys, {other.pk: {'c'}})
+
+    def test_settings_read_on_use(self):
+        cache = TokenCache()
+        with self.settings(TOKEN_CACHE_SIZE=1, TOKEN_CACHE_TTL=-1):
+            cache.set('a', self.user, None)
+            cache.set('b', self.user, None)
+            self.assertEqual(cache.stats()['size'], 1)
+            self.assertIsNone(cache.get('b'))
+
+    def test_lru_bound_and_ttl(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, self.user, None)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache = TokenCache(maxsize=2, ttl=-1)
+        cache.set('a', self.user, None)
+        self.assertIsNone(cache.get('a'))